@@ -1,21 +1,231 @@
 import os
 import jwt
+import math
+import time
 
 from datetime import datetime, timedelta, UTC
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_file, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from werkzeug.security import check_password_hash, generate_password_hash
 
-from utils import database, config
-from utils.authentication import authenticate_admin, authenticate_student, HTTPError
+from utils import admission, database, config, jobs, metrics, migrations, passwords, serialization
+from utils.authentication import (
+    authenticate_admin, authenticate_student, configure_cache, HTTPError, PRINCIPAL_CACHE
+)
+from utils.views import (
+    format_student, format_log, format_course_week, format_student_activity, format_search_hit, format_job, search_cursor,
+    make_etag, tag_response, get_limit, get_page_args, get_sync_cursor, get_date_range, get_search_args, get_export_args,
+    get_job_args, export_headers, get_stream_mode, page_rows, validate_logs, read_csv_rows, prepare_import,
+    complete_import, STREAM_CHUNK_SIZE, EXPORT_MIMETYPES, MAX_SEARCH_CANDIDATES
+)
+
+STICKY_COOKIE = 'siwes_primary'
+
+api = Blueprint('api', __name__)
+
+class SerializingJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with metrics.timer(metrics.SERIALIZE_SECONDS):
+            return serialization.dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return serialization.loads(s)
+
+def create_app(config_path=None):
+    settings = config.load_config(config_path)
+
+    # The pools only connect on first use in each process, so a preforking server
+    # can build the app in its master without handing connections to the workers.
+    pool = database.create_pool(settings)
+    read_pool = database.create_read_pool(settings, pool)
+
+    configure_cache(settings)
+    passwords.configure(settings)
+    admission.configure(settings)
+    jobs.configure(settings)
+    metrics.configure(settings)
+    serialization.configure(settings)
+
+    metrics.register_stats('siwes_db_pool', "Database connection pool", pool.stats)
+    metrics.register_stats('siwes_db_replica_pool', "Read replica connection pool", read_pool.stats)
+    metrics.register_stats('siwes_principal_cache', "Principal cache", PRINCIPAL_CACHE.stats)
+    metrics.register_stats('siwes_hashing', "Password hashing pool", passwords.stats)
+    metrics.register_stats('siwes_admission', "Admission control", admission.stats)
+
+    app = Flask(__name__)
+    app.json = SerializingJSONProvider(app)
+    app.extensions['siwes'] = {
+        'config': settings,
+        'pool': pool,
+        'read_pool': read_pool,
+        'schema_checked': False
+    }
+    app.register_blueprint(api)
+    CORS(app)
+
+    return app
+
+def get_config():
+    return current_app.extensions['siwes']['config']
+
+def get_pool():
+    return current_app.extensions['siwes']['pool']
+
+def get_read_pool():
+    return current_app.extensions['siwes']['read_pool']
+
+def check_schema(connection):
+    # Checked on the app's first connection rather than while it is built, so
+    # building the app does not need a database.
+    state = current_app.extensions['siwes']
+    if not state['schema_checked']:
+        migrations.check_schema_version(connection)
+        state['schema_checked'] = True
+
+@api.before_app_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@api.before_app_request
+def admit_request():
+    budget = admission.get_budget(request.endpoint, request.method)
+    if budget is not None:
+        budget.acquire()
+        g.budget = budget
+
+@api.after_app_request
+def record_request(response):
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else None
+        metrics.observe_request(request.method, route, response.status_code, time.perf_counter() - start)
+
+    return response
+
+@api.after_app_request
+def hold_budget(response):
+    # Streamed bodies are generated after the request context is torn down.
+    if response.is_streamed and 'budget' in g:
+        response.call_on_close(g.pop('budget').release)
+
+    return response
+
+@api.teardown_app_request
+def release_budget(exception):
+    budget = g.pop('budget', None)
+    if budget is not None:
+        budget.release()
+
+def get_connection():
+    if 'connection' not in g:
+        g.connection = get_pool().get_connection()
+        check_schema(g.connection)
+
+    return g.connection
+
+def wrote_recently():
+    return STICKY_COOKIE in request.cookies
+
+def stick(key):
+    get_read_pool().stick(key)
+    g.wrote = True
+
+@api.after_app_request
+def remember_write(response):
+    # The sticky map only covers this process, so the client carries the hint to
+    # whichever worker serves its next read.
+    if g.pop('wrote', False):
+        response.set_cookie(STICKY_COOKIE, '1', max_age=math.ceil(get_read_pool().sticky_seconds), httponly=True)
+
+    return response
+
+def get_read_connection(sticky=None):
+    if 'read_connection' not in g:
+        connection = get_read_pool().get_replica_connection(sticky) if not wrote_recently() else None
+
+        # Reads that land on the primary share the request's connection instead of
+        # waiting on the same pool for a second one.
+        g.read_connection = connection if connection is not None else get_connection()
+
+    return g.read_connection
+
+def put_connection():
+    connection = g.pop('connection', None)
+    if connection is not None:
+        if g.get('read_connection') is connection:
+            g.pop('read_connection')
+
+        get_pool().put_connection(connection)
+
+@api.teardown_app_request
+def release_connection(exception):
+    read_connection = g.pop('read_connection', None)
+    if read_connection is not None and read_connection is not g.get('connection'):
+        get_read_pool().put_connection(read_connection)
+
+    put_connection()
+
+@api.app_errorhandler(database.PoolTimeout)
+def database_unavailable(error):
+    return jsonify({"message": "Service is busy. Please try again."}), 503, {'Retry-After': '1'}
+
+@api.app_errorhandler(passwords.HashingBusy)
+def hashing_unavailable(error):
+    return jsonify({"message": "Service is busy. Please try again."}), 503, {'Retry-After': '1'}
+
+@api.app_errorhandler(admission.Overloaded)
+def request_shed(error):
+    return jsonify({"message": "Service is busy. Please try again."}), 503, {'Retry-After': str(error.retry_after)}
+
+def fetch_page(fetch, limit, *args, **kwargs):
+    if limit is None:
+        return fetch(*args, **kwargs), None
+
+    return page_rows(fetch(*args, limit=limit + 1, **kwargs), limit)
+
+def stream_response(name, formatter, fetch, *args, sticky=None, **kwargs):
+    mode = get_stream_mode(request.args)
+    dumps = current_app.json.dumps
+
+    checkout = get_pool().checkout() if wrote_recently() else get_read_pool().checkout(sticky)
+
+    def generate():
+        with checkout as connection:
+            chunk = []
+            separator = ''
+
+            if mode == 'json':
+                yield '{"%s": [' % name
+
+            for row in fetch(connection, *args, **kwargs):
+                if mode == 'ndjson':
+                    chunk.append(dumps(formatter(row)) + '\n')
+                else:
+                    chunk.append(separator + dumps(formatter(row)))
+                    separator = ','
+
+                if len(chunk) >= STREAM_CHUNK_SIZE:
+                    yield ''.join(chunk)
+                    chunk = []
+
+            if mode == 'json':
+                chunk.append(']}')
 
-CONFIG = config.load_config()
-CONNECTION = database.connect_to_db(CONFIG)
+            yield ''.join(chunk)
 
-app = Flask(__name__)
-CORS(app)
+    mimetype = 'application/x-ndjson' if mode == 'ndjson' else 'application/json'
+    return Response(generate(), mimetype=mimetype)
 
-@app.post("/student/register")
+@api.get('/metrics')
+@admission.budget(None)
+def get_metrics():
+    if not metrics.authorized(request.headers):
+        return jsonify({'message': 'Invalid token.'}), 401
+
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@api.post("/student/register")
+@admission.budget('login')
 def register_student():
     student = request.get_json()
 
@@ -27,26 +237,29 @@ def register_student():
 
     student['middle_name'] = student.get('middle_name')
 
-    student['password'] = generate_password_hash(student['password'], 'scrypt')
+    student['password'] = passwords.generate(student['password'])
 
-    response = database.create_student(CONNECTION, student)
+    response = database.create_student(get_connection(), student)
     if response == 0:
         return jsonify({"message": "This student already has an account on this platform."}), 409
 
     return jsonify({"message": "Student registered successfully."}), 200
 
-@app.post("/student/login")
+@api.post("/student/login")
+@admission.budget('login')
 def login_student():
     data = request.get_json()
 
     if not data.get('matric_num') or not data.get('password'):
         return jsonify({"message": "Incomplete credentials."}), 400
 
-    student = database.get_student_by_matric_num(CONNECTION, data['matric_num'])
+    student = database.get_student_by_matric_num(get_connection(), data['matric_num'])
+    put_connection()
+
     if not student:
         return jsonify({"message": "Invalid credentials."}), 401
 
-    if not check_password_hash(student['password'], data['password']):
+    if not passwords.verify(student['password'], data['password']):
         return jsonify({"message": "Invalid credentials."}), 401
 
     payload = {
@@ -55,13 +268,13 @@ def login_student():
         'exp': datetime.now(UTC) + timedelta(minutes=60)
     }
 
-    token = jwt.encode(payload=payload, key=CONFIG['JWT']['SECRET_KEY'], algorithm="HS256")
+    token = jwt.encode(payload=payload, key=get_config()['JWT']['SECRET_KEY'], algorithm="HS256")
     return jsonify({'token' : token})
 
-@app.post('/logs')
+@api.post('/logs')
 def add_log():
     try:
-        student = authenticate_student(CONFIG, CONNECTION)
+        student = authenticate_student(get_config(), get_connection())
 
         log = request.get_json()
         if not log.get('entry_date') or not log.get('data'):
@@ -69,95 +282,151 @@ def add_log():
 
         matric_num = student['matric_num']
 
-        database.add_student_log(CONNECTION, log, matric_num)
+        database.add_student_log(get_connection(), log, matric_num)
+        stick(matric_num)
 
         return jsonify({'message': 'Log added successfully.'}), 200
     except HTTPError as error:
         return jsonify({'message': error.message}), error.code
 
-@app.get('/logs')
+@api.post('/logs/batch')
+def add_logs():
+    try:
+        student = authenticate_student(get_config(), get_connection())
+
+        logs = request.get_json()
+        validate_logs(logs)
+
+        ids = database.add_student_logs(get_connection(), logs, student['matric_num'])
+        stick(student['matric_num'])
+
+        return jsonify({'message': 'Logs added successfully.', 'ids': ids}), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/logs')
 def student_logs():
     try:
-        student = authenticate_student(CONFIG, CONNECTION)
+        student = authenticate_student(get_config(), get_connection())
 
         matric_num = student['matric_num']
-        logs = database.get_student_logs(CONNECTION, matric_num)
+        after, limit = get_page_args(request.args, int)
+        since = get_sync_cursor(request.args) if 'since' in request.args else None
+
+        version = database.get_student_version(get_read_connection(matric_num), matric_num)
+        etag = make_etag('logs', matric_num, version, request.query_string)
+        if request.if_none_match.contains(etag):
+            return tag_response(Response(status=304), etag)
+
+        if since is not None:
+            changes = database.sync_student_logs(get_read_connection(matric_num), matric_num, since)
+            if changes is None:
+                return jsonify({"message": "Sync cursor expired, download all logs again with since=0."}), 410
+
+            logs, deleted, next_cursor = changes
+
+            response = {
+                'logs': [format_log(log) for log in logs],
+                'deleted': deleted,
+                'next': next_cursor
+            }
+
+            return tag_response(jsonify(response), etag)
+
+        if 'stream' in request.args:
+            return tag_response(
+                stream_response(
+                    'logs', format_log, database.stream_student_logs, matric_num, after=after, sticky=matric_num
+                ),
+                etag
+            )
+
+        logs, next_cursor = fetch_page(
+            database.get_student_logs, limit, get_read_connection(matric_num), matric_num, after=after
+        )
 
         response = {
-            'logs': [
-                {
-                    'id': log['id'],
-                    'entry_date': log['entry_date'],
-                    'data': log['data']
-                } for log in logs
-            ]
+            'logs': [format_log(log) for log in logs]
         }
 
-        return jsonify(response), 200
+        if limit is not None:
+            response['next'] = next_cursor
+
+        return tag_response(jsonify(response), etag)
     except HTTPError as error:
         return jsonify({'message': error.message}), error.code
 
-@app.get('/log/<id>')
+@api.get('/log/<id>')
 def student_log(id):
     try:
-        authenticate_student(CONFIG, CONNECTION)
+        student = authenticate_student(get_config(), get_connection())
+
+        version = database.get_log_version(get_read_connection(student['matric_num']), id, student['matric_num'])
+        if version is None:
+            return jsonify({"message": "Log not found."}), 404
+
+        etag = make_etag('log', id, version)
+        if request.if_none_match.contains(etag):
+            return tag_response(Response(status=304), etag)
 
-        log = database.get_student_log(CONNECTION, id)
+        log = database.get_student_log(get_read_connection(student['matric_num']), id, student['matric_num'])
         if not log:
             return jsonify({"message": "Log not found."}), 404
 
         response = {
-            'log': {
-                'id': log['id'],
-                'entry_date': log['entry_date'],
-                'data': log['data']
-            }
+            'log': format_log(log)
         }
 
-        return jsonify(response), 200
+        return tag_response(jsonify(response), etag)
     except HTTPError as error:
         return jsonify({'message': error.message}), error.code
 
-@app.delete('/log/<id>')
+@api.delete('/log/<id>')
 def delete_log(id):
     try:
-        authenticate_student(CONFIG, CONNECTION)
+        student = authenticate_student(get_config(), get_connection())
 
-        response = database.delete_log(CONNECTION, id)
+        response = database.delete_log(get_connection(), id, student['matric_num'])
         if response == 0:
             return jsonify({"message": "Log not found."}), 404
 
+        stick(student['matric_num'])
+
         return jsonify({'message': 'Log deleted successfully.'}), 200
     except HTTPError as error:
         return jsonify({'message': error.message}), error.code
 
-@app.post("/admin/register")
+@api.post("/admin/register")
+@admission.budget('login')
 def register_admin():
     admin = request.get_json()
 
     if not admin.get('name') or not admin.get('password'):
         return jsonify({"message": "Incomplete admin data."}), 400
 
-    admin['password'] = generate_password_hash(admin['password'], 'scrypt')
+    admin['password'] = passwords.generate(admin['password'])
 
-    response = database.create_admin(CONNECTION, admin)
+    response = database.create_admin(get_connection(), admin)
     if response == 0:
         return jsonify({"message": "This admin already has an account on this platform."}), 409
 
     return jsonify({"message": "Admin registered successfully."}), 200
 
-@app.post("/admin/login")
+@api.post("/admin/login")
+@admission.budget('login')
 def login_admin():
     data = request.get_json()
 
     if not data.get('name') or not data.get('password'):
         return jsonify({"message": "Incomplete credentials."}), 400
 
-    admin = database.get_admin_by_name(CONNECTION, data['name'])
+    admin = database.get_admin_by_name(get_connection(), data['name'])
+    put_connection()
+
     if not admin:
         return jsonify({"message": "Invalid credentials."}), 401
 
-    if not check_password_hash(admin['password'], data['password']):
+    if not passwords.verify(admin['password'], data['password']):
         return jsonify({"message": "Invalid credentials."}), 401
 
     payload = {
@@ -166,125 +435,254 @@ def login_admin():
         'exp': datetime.now(UTC) + timedelta(minutes=60)
     }
 
-    token = jwt.encode(payload=payload, key=CONFIG['JWT']['SECRET_KEY'], algorithm="HS256")
+    token = jwt.encode(payload=payload, key=get_config()['JWT']['SECRET_KEY'], algorithm="HS256")
     return jsonify({'token' : token})
 
-@app.get('/students')
+@api.get('/students')
 def get_students():
     try:
-        authenticate_admin(CONFIG, CONNECTION)
+        authenticate_admin(get_config(), get_connection())
 
-        if not request.args:
-            students = database.get_students(CONNECTION)
+        attribute = request.args.get('attribute')
+        value = request.args.get('value')
+
+        version = database.get_collection_version(get_read_connection(), 'students')
+        etag = make_etag('students', version, request.query_string)
+        if request.if_none_match.contains(etag):
+            return tag_response(Response(status=304), etag)
+
+        if attribute is None and value is None:
+            after, limit = get_page_args(request.args)
+
+            if 'stream' in request.args:
+                return tag_response(
+                    stream_response('students', format_student, database.stream_students, after=after), etag
+                )
+
+            students, next_cursor = fetch_page(
+                database.get_students, limit, get_read_connection(), after=after
+            )
 
             response = {
-                'students': [
-                    {
-                        'matric_num': student['matric_num'],
-                        'last_name': student['last_name'],
-                        'first_name': student['first_name'],
-                        'middle_name': student['middle_name'],
-                        'course': student['course_name']
-                    } for student in students
-               ]
+                'students': [format_student(student) for student in students]
             }
 
-            return jsonify(response), 200
+            if limit is not None:
+                response['next'] = next_cursor
 
-        attribute = request.args.get('attribute')
-        value = request.args.get('value')
+            return tag_response(jsonify(response), etag)
 
         if not attribute or not value:
             return jsonify({"message": "Incomplete request data."}), 400
 
+        limit = get_limit(request.args)
+        rank = request.args.get('rank') == 'true'
+
         if attribute == 'name':
-            students = database.get_students_by_name(CONNECTION, value)
+            students = database.get_students_by_name(get_read_connection(), value, limit=limit, rank=rank)
         elif attribute == 'course':
-            students = database.get_students_by_course(CONNECTION, value)
+            students = database.get_students_by_course(get_read_connection(), value, limit=limit, rank=rank)
         elif attribute == 'matric_num':
-            students = database.get_students_by_matric_num(CONNECTION, value)
+            students = database.get_students_by_matric_num(get_read_connection(), value, limit=limit, rank=rank)
         else:
             return jsonify({"message": "Incorrect request format."}), 400
 
         response = {
-            'students': [
-                {
-                    'matric_num': student['matric_num'],
-                    'last_name': student['last_name'],
-                    'first_name': student['first_name'],
-                    'middle_name': student['middle_name'],
-                    'course': student['course_name']
-                } for student in students
-            ]
+            'students': [format_student(student) for student in students]
         }
 
-        return jsonify(response), 200
+        return tag_response(jsonify(response), etag)
     except HTTPError as error:
         return jsonify({'message': error.message}), error.code
 
-@app.get('/student/<matric_num>')
-def get_student_data(matric_num):
+@api.post('/students/import')
+def import_students():
     try:
-        authenticate_admin(CONFIG, CONNECTION)
+        authenticate_admin(get_config(), get_connection())
 
-        matric_num = matric_num.replace('-', '/')
+        if request.mimetype == 'text/csv':
+            rows = read_csv_rows(request.get_data(as_text=True))
+        else:
+            rows = request.get_json()
 
-        student = database.get_student_by_matric_num(CONNECTION, matric_num)
-        if not student:
-            return jsonify({'message': 'Student does not exist.'}), 404
+        results, students = prepare_import(rows, database.get_course_codes(get_connection()))
+        put_connection()
+
+        hashes = passwords.hash_passwords(student['password'] for student in students)
+        for student, password_hash in zip(students, hashes):
+            student['password'] = password_hash
+
+        created = database.import_students(get_connection(), students)
 
-        student_logs = database.get_student_logs(CONNECTION, matric_num)
+        return jsonify(complete_import(results, created)), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/analytics')
+def get_analytics():
+    try:
+        authenticate_admin(get_config(), get_connection())
+
+        start, end = get_date_range(request.args)
+        after, limit = get_page_args(request.args)
+        course = request.args.get('course')
+        missing = request.args.get('missing') == 'true'
+
+        weeks = database.get_course_week_logs(get_read_connection(), start, end, course=course)
+        students, next_cursor = fetch_page(
+            database.get_student_activity, limit, get_read_connection(), start, end,
+            course=course, missing=missing, after=after
+        )
 
         response = {
-            'student': {
-                'matric_num': student['matric_num'],
-                'last_name': student['last_name'],
-                'first_name': student['first_name'],
-                'middle_name': student['middle_name'],
-                'course': student['course_name'],
-                'logs': [
-                    {
-                        'id': log['id'],
-                        'entry_date': log['entry_date'],
-                        'data': log['data']
-                    } for log in student_logs
-                ]
-            }
+            'start': start,
+            'end': end,
+            'days': (end - start).days + 1,
+            'courses': [format_course_week(week) for week in weeks],
+            'students': [format_student_activity(student) for student in students]
         }
 
+        if limit is not None:
+            response['next'] = next_cursor
+
         return jsonify(response), 200
     except HTTPError as error:
         return jsonify({'message': error.message}), error.code
 
-@app.get('/student/<matric_num>/log/<id>')
-def get_student_log(matric_num, id):
+@api.get('/search/logs')
+def search_logs():
     try:
-        authenticate_admin(CONFIG, CONNECTION)
+        authenticate_admin(get_config(), get_connection())
+
+        terms, course, start, end, after, limit = get_search_args(request.args)
+
+        hits = database.search_logs(
+            get_read_connection(), terms, start, end,
+            course=course, after=after, limit=limit + 1, candidates=MAX_SEARCH_CANDIDATES
+        )
+        hits, next_cursor = page_rows(hits, limit, search_cursor)
+
+        response = {
+            'start': start,
+            'end': end,
+            'hits': [format_search_hit(hit) for hit in hits],
+            'next': next_cursor,
+            'truncated': hits[0][5] if hits else False
+        }
+
+        return jsonify(response), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/export/logs')
+@admission.budget('export')
+def export_logs():
+    try:
+        authenticate_admin(get_config(), get_connection())
+
+        format, course, start, end = get_export_args(request.args)
+
+        chunks = database.stream_logs_export(get_read_pool(), format, course=course, start=start, end=end)
+
+        return Response(chunks, mimetype=EXPORT_MIMETYPES[format], headers=export_headers(format))
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/student/<matric_num>')
+def get_student_data(matric_num):
+    try:
+        authenticate_admin(get_config(), get_connection())
 
         matric_num = matric_num.replace('-', '/')
+        after, limit = get_page_args(request.args, int)
 
-        student = database.get_student_by_matric_num(CONNECTION, matric_num)
+        version = database.get_student_version(get_read_connection(matric_num), matric_num)
+        if version is None:
+            return jsonify({'message': 'Student does not exist.'}), 404
+
+        etag = make_etag('student', matric_num, version, request.query_string)
+        if request.if_none_match.contains(etag):
+            return tag_response(Response(status=304), etag)
+
+        student = database.get_student_data(get_read_connection(matric_num), matric_num, after=after, limit=limit)
         if not student:
             return jsonify({'message': 'Student does not exist.'}), 404
 
-        student_log = database.get_student_log(CONNECTION, id)
+        return tag_response(Response(student, status=200, mimetype='application/json'), etag)
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/student/<matric_num>/log/<id>')
+def get_student_log(matric_num, id):
+    try:
+        authenticate_admin(get_config(), get_connection())
+
+        matric_num = matric_num.replace('-', '/')
+
+        student_log = database.get_student_log_data(get_read_connection(matric_num), matric_num, id)
         if not student_log:
+            return jsonify({'message': 'Student does not exist.'}), 404
+
+        response, log_exists = student_log
+        if not log_exists:
             return jsonify({'message': 'Log does not exist.'}), 404
 
-        response = {
-            'log': {
-                'id': student_log['id'],
-                'entry_date': student_log['entry_date'],
-                'data': student_log['data']
-            }
-        }
+        return Response(response, status=200, mimetype='application/json')
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
 
-        return jsonify(response), 200
+@api.post('/jobs')
+def create_job():
+    try:
+        admin = authenticate_admin(get_config(), get_connection())
+
+        kind, params = get_job_args(request.get_json(silent=True))
+
+        job = database.create_job(get_connection(), kind, params, admin['id'], jobs.MAX_ATTEMPTS)
+
+        return jsonify({'job': format_job(job)}), 202, {'Location': f"/jobs/{job[0]}"}
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/jobs/<int:id>')
+def get_job(id):
+    try:
+        authenticate_admin(get_config(), get_connection())
+
+        job = database.get_job(get_connection(), id)
+        if not job:
+            return jsonify({'message': 'Job not found.'}), 404
+
+        return jsonify({'job': format_job(job)}), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/jobs/<int:id>/result')
+def get_job_result(id):
+    try:
+        authenticate_admin(get_config(), get_connection())
+
+        job = database.get_job(get_connection(), id)
+        if not job:
+            return jsonify({'message': 'Job not found.'}), 404
+
+        status, result = job[2], job[8]
+        if status != 'succeeded':
+            return jsonify({'message': 'Job has not finished.'}), 409
+
+        path = jobs.result_path(result)
+        if not os.path.exists(path):
+            return jsonify({'message': 'Job result is no longer available.'}), 410
+
+        return send_file(
+            path, mimetype=result['mimetype'],
+            as_attachment=True, download_name=result['file']
+        )
     except HTTPError as error:
         return jsonify({'message': error.message}), error.code
 
 if __name__ == '__main__':
-    app.run(
+    create_app().run(
         host="0.0.0.0",
         port=os.environ.get('PORT') or 4000
     )
\ No newline at end of file
@@ -0,0 +1,675 @@
+import os
+import math
+import time
+import asyncio
+import jwt
+
+from datetime import datetime, timedelta, UTC
+from psycopg_pool import PoolTimeout
+from quart import Blueprint, Quart, Response, current_app, request, jsonify, send_file, g
+from quart.json.provider import DefaultJSONProvider
+from quart_cors import cors
+
+from utils import async_database, database, config, jobs, metrics, migrations, passwords, serialization
+from utils.async_authentication import authenticate_admin, authenticate_student
+from utils.authentication import configure_cache, HTTPError, PRINCIPAL_CACHE
+from utils.views import (
+    format_student, format_log, format_course_week, format_student_activity, format_search_hit, format_job, search_cursor,
+    make_etag, tag_response, get_limit, get_page_args, get_sync_cursor, get_date_range, get_search_args, get_export_args,
+    get_job_args, export_headers, get_stream_mode, page_rows, validate_logs, read_csv_rows, prepare_import,
+    complete_import, STREAM_CHUNK_SIZE, EXPORT_MIMETYPES, MAX_SEARCH_CANDIDATES
+)
+
+STICKY_COOKIE = 'siwes_primary'
+
+api = Blueprint('api', __name__)
+
+class SerializingJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with metrics.timer(metrics.SERIALIZE_SECONDS):
+            return serialization.dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return serialization.loads(s)
+
+def create_app(config_path=None):
+    settings = config.load_config(config_path)
+
+    # The pools are opened in before_serving, inside each server worker.
+    pool = async_database.create_pool(settings)
+    read_pool = async_database.create_read_pool(settings, pool)
+
+    configure_cache(settings)
+    passwords.configure(settings)
+    jobs.configure(settings)
+    metrics.configure(settings)
+    serialization.configure(settings)
+
+    metrics.register_stats('siwes_db_pool', "Database connection pool", pool.get_stats)
+    metrics.register_stats('siwes_db_replica_pool', "Read replica connection pool", read_pool.stats)
+    metrics.register_stats('siwes_principal_cache', "Principal cache", PRINCIPAL_CACHE.stats)
+    metrics.register_stats('siwes_hashing', "Password hashing pool", passwords.stats)
+
+    app = Quart(__name__)
+    app.json = SerializingJSONProvider(app)
+    app.extensions['siwes'] = {
+        'config': settings,
+        'pool': pool,
+        'read_pool': read_pool
+    }
+    app.register_blueprint(api)
+
+    return cors(app, allow_origin="*")
+
+def get_config():
+    return current_app.extensions['siwes']['config']
+
+def get_pool():
+    return current_app.extensions['siwes']['pool']
+
+def get_read_pool():
+    return current_app.extensions['siwes']['read_pool']
+
+@api.before_app_request
+async def start_timer():
+    g.request_start = time.perf_counter()
+
+@api.after_app_request
+async def record_request(response):
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else None
+        metrics.observe_request(request.method, route, response.status_code, time.perf_counter() - start)
+
+    return response
+
+@api.before_app_serving
+async def open_pool():
+    connection = database.connect_to_db(get_config())
+    try:
+        migrations.check_schema_version(connection)
+    finally:
+        connection.close()
+
+    await get_pool().open()
+    await get_read_pool().open()
+
+@api.after_app_serving
+async def close_pool():
+    await get_read_pool().close()
+    await get_pool().close()
+
+async def get_connection():
+    if 'connection' not in g:
+        g.connection = await get_pool().getconn()
+
+    return g.connection
+
+def wrote_recently():
+    return STICKY_COOKIE in request.cookies
+
+def stick(key):
+    get_read_pool().stick(key)
+    g.wrote = True
+
+@api.after_app_request
+async def remember_write(response):
+    # The sticky map only covers this process, so the client carries the hint to
+    # whichever worker serves its next read.
+    if g.pop('wrote', False):
+        response.set_cookie(STICKY_COOKIE, '1', max_age=math.ceil(get_read_pool().sticky_seconds), httponly=True)
+
+    return response
+
+async def get_read_connection(sticky=None):
+    if 'read_connection' not in g:
+        connection = await get_read_pool().getconn_replica(sticky) if not wrote_recently() else None
+
+        # Reads that land on the primary share the request's connection instead of
+        # waiting on the same pool for a second one.
+        g.read_connection = connection if connection is not None else await get_connection()
+
+    return g.read_connection
+
+async def put_connection():
+    connection = g.pop('connection', None)
+    if connection is not None:
+        if g.get('read_connection') is connection:
+            g.pop('read_connection')
+
+        await get_pool().putconn(connection)
+
+@api.teardown_app_request
+async def release_connection(exception):
+    read_connection = g.pop('read_connection', None)
+    if read_connection is not None and read_connection is not g.get('connection'):
+        await get_read_pool().putconn(read_connection)
+
+    await put_connection()
+
+@api.app_errorhandler(PoolTimeout)
+async def database_unavailable(error):
+    return jsonify({"message": "Service is busy. Please try again."}), 503, {'Retry-After': '1'}
+
+@api.app_errorhandler(passwords.HashingBusy)
+async def hashing_unavailable(error):
+    return jsonify({"message": "Service is busy. Please try again."}), 503, {'Retry-After': '1'}
+
+async def fetch_page(fetch, limit, *args, **kwargs):
+    if limit is None:
+        return await fetch(*args, **kwargs), None
+
+    return page_rows(await fetch(*args, limit=limit + 1, **kwargs), limit)
+
+def stream_response(name, formatter, fetch, *args, sticky=None, **kwargs):
+    mode = get_stream_mode(request.args)
+    dumps = current_app.json.dumps
+
+    checkout = get_pool().connection() if wrote_recently() else get_read_pool().connection(sticky)
+
+    async def generate():
+        async with checkout as connection:
+            chunk = []
+            separator = ''
+
+            if mode == 'json':
+                yield '{"%s": [' % name
+
+            async for row in fetch(connection, *args, **kwargs):
+                if mode == 'ndjson':
+                    chunk.append(dumps(formatter(row)) + '\n')
+                else:
+                    chunk.append(separator + dumps(formatter(row)))
+                    separator = ','
+
+                if len(chunk) >= STREAM_CHUNK_SIZE:
+                    yield ''.join(chunk)
+                    chunk = []
+
+            if mode == 'json':
+                chunk.append(']}')
+
+            yield ''.join(chunk)
+
+    mimetype = 'application/x-ndjson' if mode == 'ndjson' else 'application/json'
+    return Response(generate(), mimetype=mimetype)
+
+@api.get('/metrics')
+async def get_metrics():
+    if not metrics.authorized(request.headers):
+        return jsonify({'message': 'Invalid token.'}), 401
+
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@api.post("/student/register")
+async def register_student():
+    student = await request.get_json()
+
+    if (
+        not student.get('matric_num') or not student.get('password') or not student.get('first_name') or
+        not student.get('last_name') or not student.get('course')
+    ):
+        return jsonify({"message": "Incomplete student data."}), 400
+
+    student['middle_name'] = student.get('middle_name')
+
+    student['password'] = await asyncio.to_thread(passwords.generate, student['password'])
+
+    response = await async_database.create_student(await get_connection(), student)
+    if response == 0:
+        return jsonify({"message": "This student already has an account on this platform."}), 409
+
+    return jsonify({"message": "Student registered successfully."}), 200
+
+@api.post("/student/login")
+async def login_student():
+    data = await request.get_json()
+
+    if not data.get('matric_num') or not data.get('password'):
+        return jsonify({"message": "Incomplete credentials."}), 400
+
+    student = await async_database.get_student_by_matric_num(await get_connection(), data['matric_num'])
+    await put_connection()
+
+    if not student:
+        return jsonify({"message": "Invalid credentials."}), 401
+
+    if not await asyncio.to_thread(passwords.verify, student['password'], data['password']):
+        return jsonify({"message": "Invalid credentials."}), 401
+
+    payload = {
+        'id': student['matric_num'],
+        'admin': False,
+        'exp': datetime.now(UTC) + timedelta(minutes=60)
+    }
+
+    token = jwt.encode(payload=payload, key=get_config()['JWT']['SECRET_KEY'], algorithm="HS256")
+    return jsonify({'token' : token})
+
+@api.post('/logs')
+async def add_log():
+    try:
+        student = await authenticate_student(get_config(), await get_connection(), request.headers)
+
+        log = await request.get_json()
+        if not log.get('entry_date') or not log.get('data'):
+            return jsonify({"message": "Incomplete log data."}), 400
+
+        matric_num = student['matric_num']
+
+        await async_database.add_student_log(await get_connection(), log, matric_num)
+        stick(matric_num)
+
+        return jsonify({'message': 'Log added successfully.'}), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.post('/logs/batch')
+async def add_logs():
+    try:
+        student = await authenticate_student(get_config(), await get_connection(), request.headers)
+
+        logs = await request.get_json()
+        validate_logs(logs)
+
+        ids = await async_database.add_student_logs(await get_connection(), logs, student['matric_num'])
+        stick(student['matric_num'])
+
+        return jsonify({'message': 'Logs added successfully.', 'ids': ids}), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/logs')
+async def student_logs():
+    try:
+        student = await authenticate_student(get_config(), await get_connection(), request.headers)
+
+        matric_num = student['matric_num']
+        after, limit = get_page_args(request.args, int)
+        since = get_sync_cursor(request.args) if 'since' in request.args else None
+
+        version = await async_database.get_student_version(await get_read_connection(matric_num), matric_num)
+        etag = make_etag('logs', matric_num, version, request.query_string)
+        if request.if_none_match.contains(etag):
+            return tag_response(Response('', status=304), etag)
+
+        if since is not None:
+            changes = await async_database.sync_student_logs(await get_read_connection(matric_num), matric_num, since)
+            if changes is None:
+                return jsonify({"message": "Sync cursor expired, download all logs again with since=0."}), 410
+
+            logs, deleted, next_cursor = changes
+
+            response = {
+                'logs': [format_log(log) for log in logs],
+                'deleted': deleted,
+                'next': next_cursor
+            }
+
+            return tag_response(jsonify(response), etag)
+
+        if 'stream' in request.args:
+            return tag_response(
+                stream_response(
+                    'logs', format_log, async_database.stream_student_logs, matric_num, after=after, sticky=matric_num
+                ),
+                etag
+            )
+
+        logs, next_cursor = await fetch_page(
+            async_database.get_student_logs, limit, await get_read_connection(matric_num), matric_num, after=after
+        )
+
+        response = {
+            'logs': [format_log(log) for log in logs]
+        }
+
+        if limit is not None:
+            response['next'] = next_cursor
+
+        return tag_response(jsonify(response), etag)
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/log/<id>')
+async def student_log(id):
+    try:
+        student = await authenticate_student(get_config(), await get_connection(), request.headers)
+
+        version = await async_database.get_log_version(await get_read_connection(student['matric_num']), id, student['matric_num'])
+        if version is None:
+            return jsonify({"message": "Log not found."}), 404
+
+        etag = make_etag('log', id, version)
+        if request.if_none_match.contains(etag):
+            return tag_response(Response('', status=304), etag)
+
+        log = await async_database.get_student_log(await get_read_connection(student['matric_num']), id, student['matric_num'])
+        if not log:
+            return jsonify({"message": "Log not found."}), 404
+
+        response = {
+            'log': format_log(log)
+        }
+
+        return tag_response(jsonify(response), etag)
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.delete('/log/<id>')
+async def delete_log(id):
+    try:
+        student = await authenticate_student(get_config(), await get_connection(), request.headers)
+
+        response = await async_database.delete_log(await get_connection(), id, student['matric_num'])
+        if response == 0:
+            return jsonify({"message": "Log not found."}), 404
+
+        stick(student['matric_num'])
+
+        return jsonify({'message': 'Log deleted successfully.'}), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.post("/admin/register")
+async def register_admin():
+    admin = await request.get_json()
+
+    if not admin.get('name') or not admin.get('password'):
+        return jsonify({"message": "Incomplete admin data."}), 400
+
+    admin['password'] = await asyncio.to_thread(passwords.generate, admin['password'])
+
+    response = await async_database.create_admin(await get_connection(), admin)
+    if response == 0:
+        return jsonify({"message": "This admin already has an account on this platform."}), 409
+
+    return jsonify({"message": "Admin registered successfully."}), 200
+
+@api.post("/admin/login")
+async def login_admin():
+    data = await request.get_json()
+
+    if not data.get('name') or not data.get('password'):
+        return jsonify({"message": "Incomplete credentials."}), 400
+
+    admin = await async_database.get_admin_by_name(await get_connection(), data['name'])
+    await put_connection()
+
+    if not admin:
+        return jsonify({"message": "Invalid credentials."}), 401
+
+    if not await asyncio.to_thread(passwords.verify, admin['password'], data['password']):
+        return jsonify({"message": "Invalid credentials."}), 401
+
+    payload = {
+        'id': admin['id'],
+        'admin': True,
+        'exp': datetime.now(UTC) + timedelta(minutes=60)
+    }
+
+    token = jwt.encode(payload=payload, key=get_config()['JWT']['SECRET_KEY'], algorithm="HS256")
+    return jsonify({'token' : token})
+
+@api.get('/students')
+async def get_students():
+    try:
+        await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        attribute = request.args.get('attribute')
+        value = request.args.get('value')
+
+        version = await async_database.get_collection_version(await get_read_connection(), 'students')
+        etag = make_etag('students', version, request.query_string)
+        if request.if_none_match.contains(etag):
+            return tag_response(Response('', status=304), etag)
+
+        if attribute is None and value is None:
+            after, limit = get_page_args(request.args)
+
+            if 'stream' in request.args:
+                return tag_response(
+                    stream_response('students', format_student, async_database.stream_students, after=after), etag
+                )
+
+            students, next_cursor = await fetch_page(
+                async_database.get_students, limit, await get_read_connection(), after=after
+            )
+
+            response = {
+                'students': [format_student(student) for student in students]
+            }
+
+            if limit is not None:
+                response['next'] = next_cursor
+
+            return tag_response(jsonify(response), etag)
+
+        if not attribute or not value:
+            return jsonify({"message": "Incomplete request data."}), 400
+
+        limit = get_limit(request.args)
+        rank = request.args.get('rank') == 'true'
+
+        if attribute == 'name':
+            search = async_database.get_students_by_name
+        elif attribute == 'course':
+            search = async_database.get_students_by_course
+        elif attribute == 'matric_num':
+            search = async_database.get_students_by_matric_num
+        else:
+            return jsonify({"message": "Incorrect request format."}), 400
+
+        students = await search(await get_read_connection(), value, limit=limit, rank=rank)
+
+        response = {
+            'students': [format_student(student) for student in students]
+        }
+
+        return tag_response(jsonify(response), etag)
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.post('/students/import')
+async def import_students():
+    try:
+        await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        if request.mimetype == 'text/csv':
+            rows = read_csv_rows(await request.get_data(as_text=True))
+        else:
+            rows = await request.get_json()
+
+        results, students = prepare_import(rows, await async_database.get_course_codes(await get_connection()))
+        await put_connection()
+
+        hashes = await asyncio.to_thread(
+            passwords.hash_passwords, [student['password'] for student in students]
+        )
+        for student, password_hash in zip(students, hashes):
+            student['password'] = password_hash
+
+        created = await async_database.import_students(await get_connection(), students)
+
+        return jsonify(complete_import(results, created)), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/analytics')
+async def get_analytics():
+    try:
+        await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        start, end = get_date_range(request.args)
+        after, limit = get_page_args(request.args)
+        course = request.args.get('course')
+        missing = request.args.get('missing') == 'true'
+
+        weeks = await async_database.get_course_week_logs(await get_read_connection(), start, end, course=course)
+        students, next_cursor = await fetch_page(
+            async_database.get_student_activity, limit, await get_read_connection(), start, end,
+            course=course, missing=missing, after=after
+        )
+
+        response = {
+            'start': start,
+            'end': end,
+            'days': (end - start).days + 1,
+            'courses': [format_course_week(week) for week in weeks],
+            'students': [format_student_activity(student) for student in students]
+        }
+
+        if limit is not None:
+            response['next'] = next_cursor
+
+        return jsonify(response), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/search/logs')
+async def search_logs():
+    try:
+        await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        terms, course, start, end, after, limit = get_search_args(request.args)
+
+        hits = await async_database.search_logs(
+            await get_read_connection(), terms, start, end,
+            course=course, after=after, limit=limit + 1, candidates=MAX_SEARCH_CANDIDATES
+        )
+        hits, next_cursor = page_rows(hits, limit, search_cursor)
+
+        response = {
+            'start': start,
+            'end': end,
+            'hits': [format_search_hit(hit) for hit in hits],
+            'next': next_cursor,
+            'truncated': hits[0][5] if hits else False
+        }
+
+        return jsonify(response), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/export/logs')
+async def export_logs():
+    try:
+        await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        format, course, start, end = get_export_args(request.args)
+        read_pool = get_read_pool()
+
+        async def generate():
+            async with read_pool.connection() as connection:
+                async for chunk in async_database.stream_logs_export(
+                    connection, format, course=course, start=start, end=end
+                ):
+                    yield chunk
+
+        return Response(generate(), mimetype=EXPORT_MIMETYPES[format], headers=export_headers(format))
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/student/<matric_num>')
+async def get_student_data(matric_num):
+    try:
+        await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        matric_num = matric_num.replace('-', '/')
+        after, limit = get_page_args(request.args, int)
+
+        version = await async_database.get_student_version(await get_read_connection(matric_num), matric_num)
+        if version is None:
+            return jsonify({'message': 'Student does not exist.'}), 404
+
+        etag = make_etag('student', matric_num, version, request.query_string)
+        if request.if_none_match.contains(etag):
+            return tag_response(Response('', status=304), etag)
+
+        student = await async_database.get_student_data(
+            await get_read_connection(matric_num), matric_num, after=after, limit=limit
+        )
+        if not student:
+            return jsonify({'message': 'Student does not exist.'}), 404
+
+        return tag_response(Response(student, status=200, mimetype='application/json'), etag)
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/student/<matric_num>/log/<id>')
+async def get_student_log(matric_num, id):
+    try:
+        await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        matric_num = matric_num.replace('-', '/')
+
+        student_log = await async_database.get_student_log_data(await get_read_connection(matric_num), matric_num, id)
+        if not student_log:
+            return jsonify({'message': 'Student does not exist.'}), 404
+
+        response, log_exists = student_log
+        if not log_exists:
+            return jsonify({'message': 'Log does not exist.'}), 404
+
+        return Response(response, status=200, mimetype='application/json')
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.post('/jobs')
+async def create_job():
+    try:
+        admin = await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        kind, params = get_job_args(await request.get_json(silent=True))
+
+        job = await async_database.create_job(await get_connection(), kind, params, admin['id'], jobs.MAX_ATTEMPTS)
+
+        return jsonify({'job': format_job(job)}), 202, {'Location': f"/jobs/{job[0]}"}
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/jobs/<int:id>')
+async def get_job(id):
+    try:
+        await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        job = await async_database.get_job(await get_connection(), id)
+        if not job:
+            return jsonify({'message': 'Job not found.'}), 404
+
+        return jsonify({'job': format_job(job)}), 200
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+@api.get('/jobs/<int:id>/result')
+async def get_job_result(id):
+    try:
+        await authenticate_admin(get_config(), await get_connection(), request.headers)
+
+        job = await async_database.get_job(await get_connection(), id)
+        if not job:
+            return jsonify({'message': 'Job not found.'}), 404
+
+        status, result = job[2], job[8]
+        if status != 'succeeded':
+            return jsonify({'message': 'Job has not finished.'}), 409
+
+        path = jobs.result_path(result)
+        if not os.path.exists(path):
+            return jsonify({'message': 'Job result is no longer available.'}), 410
+
+        return await send_file(
+            path, mimetype=result['mimetype'],
+            as_attachment=True, attachment_filename=result['file']
+        )
+    except HTTPError as error:
+        return jsonify({'message': error.message}), error.code
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    server_config = Config()
+    server_config.bind = [f"0.0.0.0:{os.environ.get('PORT') or 4000}"]
+
+    asyncio.run(serve(create_app(), server_config))
@@ -0,0 +1,78 @@
+import os
+import sys
+import argparse
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import database
+from load import add_postgres_arguments, throwaway_database
+
+def hammer(pool, threads, function, *args):
+    barrier = threading.Barrier(threads)
+
+    def attempt(_):
+        with pool.checkout() as connection:
+            barrier.wait()
+            return function(connection, *args)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(attempt, range(threads)))
+
+def race(pool, threads, number):
+    matric_num = f"T{number:04d}"
+    admin_name = f"concurrency-{number}"
+
+    student = {
+        'matric_num': matric_num,
+        'password': 'x',
+        'first_name': 'Concurrency',
+        'last_name': 'Test',
+        'middle_name': None,
+        'course': 'Computer Science'
+    }
+
+    created = hammer(pool, threads, database.create_student, student)
+    admins = hammer(pool, threads, database.create_admin, {'name': admin_name, 'password': 'x'})
+
+    with pool.checkout() as connection:
+        log_id = database.add_student_logs(connection, [{'entry_date': '2024-01-01', 'data': 'x'}], matric_num)[0]
+
+    deleted = hammer(pool, threads, database.delete_log, log_id, matric_num)
+
+    return {
+        'students created': sum(result != 0 for result in created),
+        'admins created': sum(result != 0 for result in admins),
+        'logs deleted': sum(result != 0 for result in deleted)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Race registrations and deletions against a throwaway Postgres and check each one happens once."
+    )
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=20)
+    add_postgres_arguments(parser)
+    args = parser.parse_args(argv)
+
+    failures = 0
+
+    with throwaway_database(args) as postgres:
+        pool = database.create_pool(postgres.settings(args.threads))
+
+        try:
+            for number in range(args.rounds):
+                for name, count in race(pool, args.threads, number).items():
+                    if count != 1:
+                        failures += 1
+                        print(f"round {number}: {name} = {count}, expected 1")
+        finally:
+            pool.close()
+
+    print(f"{args.rounds} rounds x {args.threads} threads: {failures} failures")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
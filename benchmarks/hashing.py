@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import time
+import argparse
+import configparser
+
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import passwords
+
+def measure(verify, password_hash, requests, threads):
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda _: verify(password_hash, 'password'), range(requests)))
+
+    elapsed = time.perf_counter() - start
+    assert all(results)
+
+    return elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare inline and pooled login password verification.")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16, help="concurrent request threads")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="hashing processes")
+    parser.add_argument('--n', type=int, default=32768)
+    parser.add_argument('--r', type=int, default=8)
+    parser.add_argument('--p', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    config = configparser.ConfigParser()
+    config.read_dict({
+        'HASHING': {
+            'WORKERS': args.workers,
+            'MAX_PENDING': args.threads,
+            'SCRYPT_N': args.n,
+            'SCRYPT_R': args.r,
+            'SCRYPT_P': args.p
+        }
+    })
+    passwords.configure(config)
+
+    password_hash = generate_password_hash('password', passwords.HASH_METHOD)
+    passwords.verify(password_hash, 'password')
+
+    cores = os.cpu_count() or 1
+    results = {'method': passwords.HASH_METHOD, 'requests': args.requests, 'threads': args.threads, 'cores': cores}
+
+    for name, verify in (('inline', check_password_hash), ('pool', passwords.verify)):
+        elapsed = measure(verify, password_hash, args.requests, args.threads)
+        results[name] = {
+            'seconds': round(elapsed, 3),
+            'logins_per_second': round(args.requests / elapsed, 2),
+            'logins_per_second_per_core': round(args.requests / elapsed / cores, 2)
+        }
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,423 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+import contextlib
+import configparser
+
+from datetime import date, datetime, timedelta, UTC
+
+import jwt
+import psycopg2
+import psycopg2.extras
+
+from werkzeug.security import generate_password_hash
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import migrations, passwords
+
+PASSWORD = 'benchmark'
+SECRET_KEY = 'benchmark-secret'
+FIRST_NAMES = ['Ada', 'Chidi', 'Tolu', 'Emeka', 'Ngozi', 'Bola', 'Ifeanyi', 'Kemi', 'Segun', 'Zainab']
+LAST_NAMES = ['Okafor', 'Adeyemi', 'Bello', 'Eze', 'Ogunleye', 'Musa', 'Nwosu', 'Balogun', 'Obi', 'Lawal']
+COURSES = ['CS', 'SE', 'IT', 'CT', 'CIS']
+SCENARIOS = ['login', 'add_log', 'search', 'profile', 'mixed']
+MIX = [('login', 1), ('add_log', 3), ('search', 2), ('profile', 4)]
+
+class Postgres:
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.database = f"siwes_bench_{os.getpid()}"
+
+        if args.host:
+            self.host, self.port, self.user, self.password = args.host, args.port, args.user, args.password
+        else:
+            self.host, self.port, self.user, self.password = '127.0.0.1', args.port or free_port(), 'postgres', ''
+
+    def binary(self, name):
+        return os.path.join(self.args.pg_bindir, name) if self.args.pg_bindir else name
+
+    def start(self):
+        if not self.args.host:
+            data = os.path.join(self.workdir, 'data')
+
+            subprocess.run(
+                [self.binary('initdb'), '-D', data, '-U', self.user, '--auth=trust', '-E', 'UTF8'],
+                check=True, stdout=subprocess.DEVNULL
+            )
+            subprocess.run(
+                [
+                    self.binary('pg_ctl'), '-D', data, '-w', '-l', os.path.join(self.workdir, 'postgres.log'),
+                    '-o', f"-p {self.port} -k {self.workdir} -c listen_addresses=127.0.0.1", 'start'
+                ],
+                check=True, stdout=subprocess.DEVNULL
+            )
+
+        with contextlib.closing(self.connect('postgres')) as connection:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f'CREATE DATABASE "{self.database}" ENCODING UTF8 TEMPLATE template0')
+
+    def stop(self):
+        try:
+            with contextlib.closing(self.connect('postgres')) as connection:
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP DATABASE IF EXISTS "{self.database}" WITH (FORCE)')
+        finally:
+            if not self.args.host:
+                subprocess.run(
+                    [self.binary('pg_ctl'), '-D', os.path.join(self.workdir, 'data'), '-w', '-m', 'fast', 'stop'],
+                    stdout=subprocess.DEVNULL
+                )
+
+    def connect(self, database=None):
+        return psycopg2.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=database or self.database
+        )
+
+    def settings(self, pool_size):
+        config = configparser.ConfigParser()
+        config.optionxform = str
+        config.read_dict({
+            'DATABASE': {
+                'HOST': self.host,
+                'PORT': str(self.port),
+                'USER': self.user,
+                'PASSWORD': self.password,
+                'DATABASE': self.database,
+                'POOL_MAX_SIZE': str(pool_size)
+            },
+            'JWT': {'SECRET_KEY': SECRET_KEY},
+            'HASHING': {'MAX_PENDING': str(pool_size)}
+        })
+
+        return config
+
+    def write_config(self, path, pool_size):
+        with open(path, 'w') as file:
+            self.settings(pool_size).write(file)
+
+def add_postgres_arguments(parser):
+    parser.add_argument('--pg-bindir', help="directory holding initdb and pg_ctl, defaults to PATH")
+    parser.add_argument('--host', help="use an existing server instead of starting one")
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--keep', action='store_true', help="keep the working directory")
+
+@contextlib.contextmanager
+def throwaway_database(args):
+    workdir = tempfile.mkdtemp(prefix='siwes-bench-')
+    postgres = Postgres(args, workdir)
+
+    try:
+        postgres.start()
+
+        with contextlib.closing(postgres.connect()) as connection:
+            migrations.apply_migrations(connection)
+
+        yield postgres
+    finally:
+        postgres.stop()
+
+        if args.keep:
+            print(f"working directory kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def seed(connection, args):
+    password_hash = generate_password_hash(PASSWORD, passwords.HASH_METHOD)
+    rng = random.Random(args.seed)
+
+    students = [
+        (
+            f"BN/{number:06d}", password_hash, rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES),
+            None, rng.choice(COURSES)
+        )
+        for number in range(args.students)
+    ]
+    admins = [(f"bench-admin-{number}", password_hash) for number in range(args.admins)]
+
+    start = date(2024, 1, 1)
+    logs = [
+        (start + timedelta(days=day), f"Benchmark log entry {day} for {student[0]}.", student[0])
+        for student in students
+        for day in range(args.logs_per_student)
+    ]
+
+    with connection.cursor() as cursor:
+        psycopg2.extras.execute_values(
+            cursor,
+            "INSERT INTO students (matric_num, password, last_name, first_name, middle_name, course) VALUES %s",
+            students, page_size=1000
+        )
+        psycopg2.extras.execute_values(
+            cursor, "INSERT INTO admins (name, password) VALUES %s RETURNING id", admins, page_size=1000
+        )
+        admin_ids = [row[0] for row in cursor.fetchall()]
+        psycopg2.extras.execute_values(
+            cursor, "INSERT INTO logs (entry_date, data, student) VALUES %s", logs, page_size=1000
+        )
+        cursor.execute("ANALYZE")
+
+    connection.commit()
+
+    return [student[0] for student in students], admin_ids
+
+def make_token(id, admin):
+    payload = {
+        'id': id,
+        'admin': admin,
+        'exp': datetime.now(UTC) + timedelta(hours=6)
+    }
+
+    return jwt.encode(payload=payload, key=SECRET_KEY, algorithm="HS256")
+
+def start_app(args, workdir, port):
+    script = 'asgi.py' if args.server == 'asgi' else 'app.py'
+    env = dict(os.environ, PORT=str(port), PYTHONPATH=ROOT)
+
+    log = open(os.path.join(workdir, 'app.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, script)], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+        start_new_session=True
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{script} exited with code {process.returncode}, see {log.name}")
+
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+
+    stop_app(process)
+    raise RuntimeError(f"{script} did not start listening on port {port}")
+
+def stop_app(process):
+    # The hashing pool forks workers that would outlive the app on a plain terminate().
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+def build_request(scenario, rng, students, admin_ids, student_tokens, admin_tokens):
+    if scenario == 'mixed':
+        scenario = rng.choices([name for name, _ in MIX], weights=[weight for _, weight in MIX])[0]
+
+    if scenario == 'login':
+        body = {'matric_num': rng.choice(students), 'password': PASSWORD}
+        return 'login', 'POST', '/student/login', body, {}
+
+    if scenario == 'add_log':
+        matric_num = rng.choice(students)
+        body = {'entry_date': date.today().isoformat(), 'data': 'Load test entry.'}
+        return 'add_log', 'POST', '/logs', body, {'Authorization': 'Bearer ' + student_tokens[matric_num]}
+
+    headers = {'Authorization': 'Bearer ' + admin_tokens[rng.choice(admin_ids)]}
+
+    if scenario == 'search':
+        value = rng.choice(FIRST_NAMES + LAST_NAMES)[:rng.randint(2, 4)]
+        return 'search', 'GET', f"/students?attribute=name&value={value}&limit=20", None, headers
+
+    matric_num = rng.choice(students).replace('/', '-')
+    return 'profile', 'GET', f"/student/{matric_num}?limit=20", None, headers
+
+def drive(port, scenario, args, students, admin_ids, student_tokens, admin_tokens):
+    samples = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def worker(number):
+        rng = random.Random(args.seed * 1000 + number)
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local = {}
+
+        while time.monotonic() < deadline:
+            name, method, path, body, headers = build_request(
+                scenario, rng, students, admin_ids, student_tokens, admin_tokens
+            )
+            if body is not None:
+                headers = dict(headers, **{'Content-Type': 'application/json'})
+                body = json.dumps(body)
+
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+                if response.will_close:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+
+            latencies, errors = local.setdefault(name, ([], [0]))
+            latencies.append(time.perf_counter() - start)
+            errors[0] += not ok
+
+        connection.close()
+
+        with lock:
+            for name, (latencies, errors) in local.items():
+                merged = samples.setdefault(name, ([], [0]))
+                merged[0].extend(latencies)
+                merged[1][0] += errors[0]
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {name: summarize(latencies, errors[0], elapsed) for name, (latencies, errors) in samples.items()}
+
+def percentile(values, fraction):
+    if not values:
+        return None
+
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2)
+    }
+
+def compare(results, baseline, tolerance):
+    regressions = []
+
+    for scenario, endpoints in results['scenarios'].items():
+        for endpoint, current in endpoints.items():
+            previous = baseline.get('scenarios', {}).get(scenario, {}).get(endpoint)
+            if not previous:
+                continue
+
+            changes = {
+                'throughput': current['throughput'] / previous['throughput'] - 1 if previous['throughput'] else 0,
+                'p95_ms': current['p95_ms'] / previous['p95_ms'] - 1 if previous['p95_ms'] else 0,
+                'p99_ms': current['p99_ms'] / previous['p99_ms'] - 1 if previous['p99_ms'] else 0
+            }
+            current['change'] = {name: round(change, 4) for name, change in changes.items()}
+
+            if changes['throughput'] < -tolerance or changes['p95_ms'] > tolerance:
+                regressions.append(f"{scenario}/{endpoint}")
+
+    return regressions
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Start the app against a throwaway Postgres, seed it and measure per-endpoint latency."
+    )
+    parser.add_argument('--server', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--admins', type=int, default=5)
+    parser.add_argument('--logs-per-student', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10, help="seconds per scenario")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write results JSON to this file")
+    parser.add_argument('--baseline', help="results JSON from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed relative regression")
+    add_postgres_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with throwaway_database(args) as postgres:
+        postgres.write_config(os.path.join(postgres.workdir, 'config.ini'), args.concurrency)
+
+        with contextlib.closing(postgres.connect()) as connection:
+            students, admin_ids = seed(connection, args)
+
+        student_tokens = {matric_num: make_token(matric_num, False) for matric_num in students}
+        admin_tokens = {id: make_token(id, True) for id in admin_ids}
+
+        port = free_port()
+        app = start_app(args, postgres.workdir, port)
+
+        try:
+            results = {
+                'commit': git_commit(),
+                'server': args.server,
+                'python': platform.python_version(),
+                'cores': os.cpu_count(),
+                'students': args.students,
+                'admins': args.admins,
+                'logs_per_student': args.logs_per_student,
+                'concurrency': args.concurrency,
+                'duration': args.duration,
+                'scenarios': {}
+            }
+
+            for scenario in args.scenarios:
+                results['scenarios'][scenario] = drive(
+                    port, scenario, args, students, admin_ids, student_tokens, admin_tokens
+                )
+        finally:
+            stop_app(app)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        results['regressions'] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+
+    print(output)
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import psycopg2.extensions
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import database
+from load import add_postgres_arguments, throwaway_database
+
+def measure(function, iterations):
+    function()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def planning_time(connection, builder, *args):
+    query, values = builder(*args)
+
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + query, values)
+        plan = cursor.fetchone()[0][0]
+
+    connection.rollback()
+
+    return plan['Planning Time'] * 1000
+
+def run(plain, prepared, iterations):
+    matric_num = "PB/1"
+    database.create_student(prepared, {
+        'matric_num': matric_num,
+        'password': 'x',
+        'first_name': 'Prepared',
+        'last_name': 'Benchmark',
+        'middle_name': None,
+        'course': 'Computer Science'
+    })
+    database.create_admin(prepared, {'name': "prepared", 'password': 'x'})
+    admin_id = database.get_admin_by_name(prepared, "prepared")['id']
+
+    log = {'entry_date': '2024-01-01', 'data': 'Prepared statement benchmark.'}
+    cases = {
+        'get_student_by_matric_num': (
+            lambda connection: database.get_student_by_matric_num(connection, matric_num),
+            (database.student_by_matric_num_query, matric_num)
+        ),
+        'get_admin_by_id': (
+            lambda connection: database.get_admin_by_id(connection, admin_id),
+            (database.admin_by_id_query, admin_id)
+        ),
+        'get_student_logs': (
+            lambda connection: database.get_student_logs(connection, matric_num, limit=20),
+            (database.student_logs_query, matric_num, None, 20)
+        ),
+        'add_student_log': (
+            lambda connection: database.add_student_log(connection, log, matric_num),
+            None
+        )
+    }
+
+    results = {'iterations': iterations}
+
+    for name, (function, explain) in cases.items():
+        unprepared_us = measure(lambda: function(plain), iterations)
+        prepared_us = measure(lambda: function(prepared), iterations)
+
+        results[name] = {
+            'unprepared_us': round(unprepared_us, 1),
+            'prepared_us': round(prepared_us, 1),
+            'saved_us': round(unprepared_us - prepared_us, 1)
+        }
+
+        if explain:
+            results[name]['planning_us'] = round(planning_time(plain, *explain), 1)
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare the hot queries with and without server-side prepared statements on a throwaway Postgres."
+    )
+    parser.add_argument('--iterations', type=int, default=2000)
+    add_postgres_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with throwaway_database(args) as postgres:
+        settings = postgres.settings(1)
+        plain = database.connect_to_db(settings, psycopg2.extensions.connection)
+        prepared = database.connect_to_db(settings)
+
+        try:
+            results = run(plain, prepared, args.iterations)
+        finally:
+            plain.close()
+            prepared.close()
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
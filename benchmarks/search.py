@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import config, database
+from utils.views import MAX_SEARCH_CANDIDATES
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return round(timings[min(len(timings) - 1, int(len(timings) * fraction))] * 1000, 2)
+
+def measure(function, repeat):
+    function()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return {'p50_ms': percentile(timings, 0.5), 'p95_ms': percentile(timings, 0.95), 'max_ms': percentile(timings, 1)}
+
+def matches(connection, terms, start, end):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM logs WHERE search @@ websearch_to_tsquery('english', %s) "
+            "AND entry_date BETWEEN %s AND %s",
+            (terms, start, end)
+        )
+        count = cursor.fetchone()[0]
+
+    connection.rollback()
+
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time ranked log searches against the configured database.")
+    parser.add_argument('--terms', nargs='+', default=['network', 'firewall rules', '"patch panel"', 'w1f4'])
+    parser.add_argument('--end', type=date.fromisoformat)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--course')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--candidates', type=int, default=MAX_SEARCH_CANDIDATES)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    connection = database.connect_to_db(config.load_config())
+
+    end = args.end
+    if end is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT max(entry_date) FROM logs")
+            end = cursor.fetchone()[0] or date.today()
+
+        connection.rollback()
+
+    start = end - timedelta(days=args.days - 1)
+
+    def search(terms, after=None):
+        return database.search_logs(
+            connection, terms, start, end,
+            course=args.course, after=after, limit=args.limit + 1, candidates=args.candidates or None
+        )
+
+    def page_through(terms):
+        after = None
+        for _ in range(args.pages):
+            rows = search(terms, after)
+            if len(rows) <= args.limit:
+                break
+
+            after = (rows[args.limit - 1][-1], rows[args.limit - 1][0])
+
+    results = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'limit': args.limit,
+        'candidates': args.candidates
+    }
+
+    try:
+        for terms in args.terms:
+            results[terms] = {
+                'matches': matches(connection, terms, start, end),
+                'first_page': measure(lambda: search(terms), args.repeat),
+                f'{args.pages}_pages': measure(lambda: page_through(terms), args.repeat)
+            }
+    finally:
+        connection.close()
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
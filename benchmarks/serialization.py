@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+from datetime import date, datetime, timedelta, UTC
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import serialization
+from utils.views import format_log
+
+def measure(function, repeat):
+    function()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return round(min(timings) * 1000, 2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time serializing a large /logs response.")
+    parser.add_argument('--logs', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    start = date(2024, 1, 1)
+    written = datetime(2024, 1, 1, 9, tzinfo=UTC)
+    rows = [
+        (
+            id, start + timedelta(days=id % 365), f"Worked on task {id} with the networking team.",
+            written + timedelta(minutes=id), written + timedelta(minutes=id)
+        )
+        for id in range(1, args.logs + 1)
+    ]
+    dict_rows = [
+        {
+            'id': id, 'entry_date': entry_date, 'data': data, 'student': 'CS/001',
+            'created_at': created_at, 'updated_at': updated_at
+        }
+        for id, entry_date, data, created_at, updated_at in rows
+    ]
+
+    flask_json = DefaultJSONProvider(Flask(__name__))
+
+    def dict_rows_flask():
+        return flask_json.dumps({
+            'logs': [
+                {
+                    'id': log['id'], 'entry_date': log['entry_date'], 'data': log['data'],
+                    'created_at': log['created_at'], 'updated_at': log['updated_at']
+                }
+                for log in dict_rows
+            ]
+        })
+
+    def tuple_rows(serializer):
+        serialization.SERIALIZER = serializer
+        return serialization.dumps({'logs': [format_log(log) for log in rows]})
+
+    assert json.loads(dict_rows_flask()) == json.loads(tuple_rows('orjson')) == json.loads(tuple_rows('json'))
+
+    results = {
+        'logs': args.logs,
+        'dict_rows_flask_ms': measure(dict_rows_flask, args.repeat),
+        'tuple_rows_json_ms': measure(lambda: tuple_rows('json'), args.repeat),
+        'tuple_rows_orjson_ms': measure(lambda: tuple_rows('orjson'), args.repeat),
+        'format_only_ms': measure(lambda: [format_log(log) for log in rows], args.repeat)
+    }
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+CREATE TABLE IF NOT EXISTS admins (
+id SERIAL PRIMARY KEY,
+name text NOT NULL,
+password text NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS courses (
+code varchar(10) NOT NULL PRIMARY KEY,
+name text NOT NULL
+);
+
+INSERT INTO courses (code, name)
+VALUES ('CS', 'Computer Science'),
+    ('SE', 'Software Engineering'),
+    ('IT', 'Information Technology'),
+    ('CT', 'Computer Technology'),
+    ('CIS', 'Computer Information Systems')
+    ON CONFLICT (code) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS students (
+matric_num varchar(10) NOT NULL PRIMARY KEY,
+password text NOT NULL,
+last_name text NOT NULL,
+first_name text NOT NULL,
+middle_name text,
+course varchar(10) NOT NULL,
+FOREIGN KEY (course) REFERENCES courses (code)
+);
+
+CREATE TABLE IF NOT EXISTS logs (
+id SERIAL PRIMARY KEY,
+entry_date date NOT NULL,
+data text NOT NULL,
+student varchar(10) NOT NULL,
+FOREIGN KEY (student) REFERENCES students (matric_num)
+);
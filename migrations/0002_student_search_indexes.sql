@@ -0,0 +1,16 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS students_first_name_trgm_idx
+ON students USING gin (first_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS students_last_name_trgm_idx
+ON students USING gin (last_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS students_middle_name_trgm_idx
+ON students USING gin (middle_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS students_matric_num_trgm_idx
+ON students USING gin (matric_num gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS students_course_idx
+ON students (course);
@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS logs_student_id_idx
+ON logs (student, id);
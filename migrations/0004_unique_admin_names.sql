@@ -0,0 +1,2 @@
+CREATE UNIQUE INDEX IF NOT EXISTS admins_name_key
+ON admins (name);
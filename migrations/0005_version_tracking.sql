@@ -0,0 +1,69 @@
+ALTER TABLE students ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS collection_versions (
+name text NOT NULL PRIMARY KEY,
+version bigint NOT NULL DEFAULT 0
+);
+
+INSERT INTO collection_versions (name)
+VALUES ('students')
+    ON CONFLICT (name) DO NOTHING;
+
+-- The bumps fire once per statement, but each one still row-locks until commit: a
+-- log write locks its student's row, and any student insert, delete or profile edit
+-- locks the single 'students' row of collection_versions. Writes for one student and
+-- concurrent registrations therefore queue behind each other. The writers commit
+-- straight after their one statement (imports once per batch), so the wait is the
+-- commit itself. version is not indexed, so the bumps stay HOT updates.
+CREATE OR REPLACE FUNCTION bump_student_log_versions() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE students SET version = version + 1
+        WHERE matric_num IN (SELECT student FROM old_logs);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE students SET version = version + 1
+        WHERE matric_num IN (SELECT student FROM new_logs);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER logs_insert_bump_student_version
+AFTER INSERT ON logs
+REFERENCING NEW TABLE AS new_logs
+FOR EACH STATEMENT EXECUTE FUNCTION bump_student_log_versions();
+
+CREATE TRIGGER logs_update_bump_student_version
+AFTER UPDATE ON logs
+REFERENCING OLD TABLE AS old_logs NEW TABLE AS new_logs
+FOR EACH STATEMENT EXECUTE FUNCTION bump_student_log_versions();
+
+CREATE TRIGGER logs_delete_bump_student_version
+AFTER DELETE ON logs
+REFERENCING OLD TABLE AS old_logs
+FOR EACH STATEMENT EXECUTE FUNCTION bump_student_log_versions();
+
+CREATE OR REPLACE FUNCTION bump_student_profile_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER students_bump_version
+BEFORE UPDATE OF matric_num, first_name, last_name, middle_name, course ON students
+FOR EACH ROW EXECUTE FUNCTION bump_student_profile_version();
+
+CREATE OR REPLACE FUNCTION bump_students_collection_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE collection_versions SET version = version + 1 WHERE name = 'students';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER students_bump_collection_version
+AFTER INSERT OR DELETE OR UPDATE OF matric_num, first_name, last_name, middle_name, course ON students
+FOR EACH STATEMENT EXECUTE FUNCTION bump_students_collection_version();
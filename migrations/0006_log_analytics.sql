@@ -0,0 +1,156 @@
+CREATE TABLE IF NOT EXISTS student_log_days (
+student varchar(10) NOT NULL,
+entry_date date NOT NULL,
+log_count integer NOT NULL,
+PRIMARY KEY (student, entry_date),
+FOREIGN KEY (student) REFERENCES students (matric_num) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS student_log_days_entry_date_idx
+ON student_log_days (entry_date);
+
+CREATE TABLE IF NOT EXISTS student_log_summaries (
+student varchar(10) NOT NULL PRIMARY KEY,
+log_count integer NOT NULL,
+first_entry_date date NOT NULL,
+last_entry_date date NOT NULL,
+FOREIGN KEY (student) REFERENCES students (matric_num) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS course_week_logs (
+course varchar(10) NOT NULL,
+week date NOT NULL,
+log_count integer NOT NULL,
+PRIMARY KEY (course, week),
+FOREIGN KEY (course) REFERENCES courses (code)
+);
+
+CREATE OR REPLACE FUNCTION refresh_student_log_summaries(affected varchar[]) RETURNS void AS $$
+BEGIN
+    DELETE FROM student_log_days
+    WHERE student = ANY(affected) AND log_count <= 0;
+
+    INSERT INTO student_log_summaries (student, log_count, first_entry_date, last_entry_date)
+    SELECT student, sum(log_count), min(entry_date), max(entry_date)
+    FROM student_log_days
+    WHERE student = ANY(affected)
+    GROUP BY student
+    ORDER BY student
+        ON CONFLICT (student) DO UPDATE
+        SET log_count = excluded.log_count,
+            first_entry_date = excluded.first_entry_date,
+            last_entry_date = excluded.last_entry_date;
+
+    DELETE FROM student_log_summaries
+    WHERE student = ANY(affected)
+        AND NOT EXISTS (SELECT 1 FROM student_log_days WHERE student_log_days.student = student_log_summaries.student);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_log_analytics() RETURNS trigger AS $$
+DECLARE
+    affected varchar[] := '{}';
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE student_log_days SET log_count = student_log_days.log_count - removed.log_count
+        FROM (
+            SELECT student, entry_date, count(*) AS log_count FROM old_logs GROUP BY student, entry_date
+        ) removed
+        WHERE student_log_days.student = removed.student AND student_log_days.entry_date = removed.entry_date;
+
+        UPDATE course_week_logs SET log_count = course_week_logs.log_count - removed.log_count
+        FROM (
+            SELECT students.course, date_trunc('week', old_logs.entry_date)::date AS week, count(*) AS log_count
+            FROM old_logs JOIN students ON students.matric_num = old_logs.student
+            GROUP BY students.course, week
+        ) removed
+        WHERE course_week_logs.course = removed.course AND course_week_logs.week = removed.week;
+
+        DELETE FROM course_week_logs WHERE log_count <= 0;
+
+        affected := affected || ARRAY(SELECT DISTINCT student FROM old_logs);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO student_log_days (student, entry_date, log_count)
+        SELECT student, entry_date, count(*) FROM new_logs
+        GROUP BY student, entry_date
+        ORDER BY student, entry_date
+            ON CONFLICT (student, entry_date) DO UPDATE
+            SET log_count = student_log_days.log_count + excluded.log_count;
+
+        INSERT INTO course_week_logs (course, week, log_count)
+        SELECT students.course, date_trunc('week', new_logs.entry_date)::date AS week, count(*)
+        FROM new_logs JOIN students ON students.matric_num = new_logs.student
+        GROUP BY students.course, week
+        ORDER BY students.course, week
+            ON CONFLICT (course, week) DO UPDATE
+            SET log_count = course_week_logs.log_count + excluded.log_count;
+
+        affected := affected || ARRAY(SELECT DISTINCT student FROM new_logs);
+    END IF;
+
+    PERFORM refresh_student_log_summaries(affected);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER logs_insert_analytics
+AFTER INSERT ON logs
+REFERENCING NEW TABLE AS new_logs
+FOR EACH STATEMENT EXECUTE FUNCTION update_log_analytics();
+
+CREATE TRIGGER logs_update_analytics
+AFTER UPDATE ON logs
+REFERENCING OLD TABLE AS old_logs NEW TABLE AS new_logs
+FOR EACH STATEMENT EXECUTE FUNCTION update_log_analytics();
+
+CREATE TRIGGER logs_delete_analytics
+AFTER DELETE ON logs
+REFERENCING OLD TABLE AS old_logs
+FOR EACH STATEMENT EXECUTE FUNCTION update_log_analytics();
+
+CREATE OR REPLACE FUNCTION move_course_week_logs() RETURNS trigger AS $$
+BEGIN
+    UPDATE course_week_logs SET log_count = course_week_logs.log_count - moved.log_count
+    FROM (
+        SELECT date_trunc('week', entry_date)::date AS week, sum(log_count) AS log_count
+        FROM student_log_days WHERE student = NEW.matric_num
+        GROUP BY week
+    ) moved
+    WHERE course_week_logs.course = OLD.course AND course_week_logs.week = moved.week;
+
+    INSERT INTO course_week_logs (course, week, log_count)
+    SELECT NEW.course, date_trunc('week', entry_date)::date AS week, sum(log_count)
+    FROM student_log_days WHERE student = NEW.matric_num
+    GROUP BY week
+        ON CONFLICT (course, week) DO UPDATE
+        SET log_count = course_week_logs.log_count + excluded.log_count;
+
+    DELETE FROM course_week_logs WHERE course = OLD.course AND log_count <= 0;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER students_move_course_week_logs
+AFTER UPDATE OF course ON students
+FOR EACH ROW WHEN (OLD.course IS DISTINCT FROM NEW.course)
+EXECUTE FUNCTION move_course_week_logs();
+
+INSERT INTO student_log_days (student, entry_date, log_count)
+SELECT student, entry_date, count(*) FROM logs
+GROUP BY student, entry_date
+    ON CONFLICT (student, entry_date) DO NOTHING;
+
+INSERT INTO course_week_logs (course, week, log_count)
+SELECT students.course, date_trunc('week', logs.entry_date)::date AS week, count(*)
+FROM logs JOIN students ON students.matric_num = logs.student
+GROUP BY students.course, week
+    ON CONFLICT (course, week) DO NOTHING;
+
+INSERT INTO student_log_summaries (student, log_count, first_entry_date, last_entry_date)
+SELECT student, sum(log_count), min(entry_date), max(entry_date) FROM student_log_days
+GROUP BY student
+    ON CONFLICT (student) DO NOTHING;
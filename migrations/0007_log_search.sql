@@ -0,0 +1,9 @@
+ALTER TABLE logs
+ADD COLUMN IF NOT EXISTS search tsvector
+GENERATED ALWAYS AS (to_tsvector('english', data)) STORED;
+
+CREATE INDEX IF NOT EXISTS logs_search_idx
+ON logs USING gin (search);
+
+CREATE INDEX IF NOT EXISTS logs_entry_date_id_idx
+ON logs (entry_date, id);
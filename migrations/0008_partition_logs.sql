@@ -0,0 +1,98 @@
+ALTER TABLE logs RENAME TO logs_unpartitioned;
+
+CREATE TABLE logs (
+id integer NOT NULL DEFAULT nextval('logs_id_seq'),
+entry_date date NOT NULL,
+data text NOT NULL,
+student varchar(10) NOT NULL,
+search tsvector GENERATED ALWAYS AS (to_tsvector('english', data)) STORED,
+FOREIGN KEY (student) REFERENCES students (matric_num)
+) PARTITION BY RANGE (entry_date);
+
+ALTER SEQUENCE logs_id_seq OWNED BY logs.id;
+
+CREATE TABLE logs_default PARTITION OF logs DEFAULT;
+
+CREATE OR REPLACE FUNCTION create_log_partition(month date) RETURNS text AS $$
+DECLARE
+    start_date date := date_trunc('month', month)::date;
+    end_date date := (date_trunc('month', month) + interval '1 month')::date;
+    partition text := 'logs_' || to_char(month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition) IS NOT NULL THEN
+        RETURN partition;
+    END IF;
+
+    -- Rows that landed in the default partition before this month existed have to move
+    -- out of it, otherwise attaching the new range fails.
+    EXECUTE format('CREATE TABLE %I (LIKE logs INCLUDING DEFAULTS INCLUDING GENERATED)', partition);
+
+    EXECUTE format(
+        'WITH moved AS ('
+        'DELETE FROM logs_default WHERE entry_date >= $1 AND entry_date < $2 '
+        'RETURNING id, entry_date, data, student'
+        ') INSERT INTO %I (id, entry_date, data, student) SELECT * FROM moved',
+        partition
+    ) USING start_date, end_date;
+
+    EXECUTE format(
+        'ALTER TABLE logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition, start_date, end_date
+    );
+
+    RETURN partition;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_log_partition(month::date) FROM (
+    SELECT DISTINCT date_trunc('month', entry_date) AS month FROM logs_unpartitioned
+    UNION
+    SELECT generate_series(date_trunc('month', now()), date_trunc('month', now()) + interval '3 months', interval '1 month')
+) months
+ORDER BY month;
+
+INSERT INTO logs (id, entry_date, data, student)
+SELECT id, entry_date, data, student FROM logs_unpartitioned;
+
+DROP TABLE logs_unpartitioned;
+
+ALTER TABLE logs ADD PRIMARY KEY (id, entry_date);
+
+CREATE INDEX IF NOT EXISTS logs_student_id_idx
+ON logs (student, id);
+
+CREATE INDEX IF NOT EXISTS logs_search_idx
+ON logs USING gin (search);
+
+CREATE INDEX IF NOT EXISTS logs_entry_date_id_idx
+ON logs (entry_date, id);
+
+CREATE TRIGGER logs_insert_bump_student_version
+AFTER INSERT ON logs
+REFERENCING NEW TABLE AS new_logs
+FOR EACH STATEMENT EXECUTE FUNCTION bump_student_log_versions();
+
+CREATE TRIGGER logs_update_bump_student_version
+AFTER UPDATE ON logs
+REFERENCING OLD TABLE AS old_logs NEW TABLE AS new_logs
+FOR EACH STATEMENT EXECUTE FUNCTION bump_student_log_versions();
+
+CREATE TRIGGER logs_delete_bump_student_version
+AFTER DELETE ON logs
+REFERENCING OLD TABLE AS old_logs
+FOR EACH STATEMENT EXECUTE FUNCTION bump_student_log_versions();
+
+CREATE TRIGGER logs_insert_analytics
+AFTER INSERT ON logs
+REFERENCING NEW TABLE AS new_logs
+FOR EACH STATEMENT EXECUTE FUNCTION update_log_analytics();
+
+CREATE TRIGGER logs_update_analytics
+AFTER UPDATE ON logs
+REFERENCING OLD TABLE AS old_logs NEW TABLE AS new_logs
+FOR EACH STATEMENT EXECUTE FUNCTION update_log_analytics();
+
+CREATE TRIGGER logs_delete_analytics
+AFTER DELETE ON logs
+REFERENCING OLD TABLE AS old_logs
+FOR EACH STATEMENT EXECUTE FUNCTION update_log_analytics();
@@ -0,0 +1,37 @@
+CREATE TABLE IF NOT EXISTS jobs (
+id bigserial PRIMARY KEY,
+kind text NOT NULL,
+params jsonb NOT NULL DEFAULT '{}',
+status text NOT NULL DEFAULT 'queued',
+attempts integer NOT NULL DEFAULT 0,
+max_attempts integer NOT NULL DEFAULT 3,
+progress_done bigint NOT NULL DEFAULT 0,
+progress_total bigint,
+result jsonb,
+error text,
+created_by integer,
+created_at timestamptz NOT NULL DEFAULT now(),
+run_at timestamptz NOT NULL DEFAULT now(),
+started_at timestamptz,
+finished_at timestamptz,
+locked_until timestamptz,
+CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+FOREIGN KEY (created_by) REFERENCES admins (id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS jobs_queued_idx
+ON jobs (run_at, id) WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS jobs_running_idx
+ON jobs (locked_until) WHERE status = 'running';
+
+CREATE OR REPLACE FUNCTION notify_jobs() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('jobs', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER jobs_notify
+AFTER INSERT ON jobs
+FOR EACH STATEMENT EXECUTE FUNCTION notify_jobs();
@@ -0,0 +1,93 @@
+-- Constant defaults keep these from rewriting every partition; existing logs count as
+-- created now and as changed before any sync cursor.
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS created_at timestamptz NOT NULL DEFAULT now();
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+ALTER TABLE logs ADD COLUMN IF NOT EXISTS change_xid xid8 NOT NULL DEFAULT '0';
+
+ALTER TABLE logs ALTER COLUMN change_xid SET DEFAULT pg_current_xact_id();
+
+CREATE INDEX IF NOT EXISTS logs_student_change_xid_idx
+ON logs (student, change_xid);
+
+CREATE TABLE IF NOT EXISTS log_tombstones (
+id integer NOT NULL PRIMARY KEY,
+student varchar(10) NOT NULL,
+deleted_at timestamptz NOT NULL DEFAULT now(),
+change_xid xid8 NOT NULL DEFAULT pg_current_xact_id()
+);
+
+CREATE INDEX IF NOT EXISTS log_tombstones_student_change_xid_idx
+ON log_tombstones (student, change_xid);
+
+CREATE INDEX IF NOT EXISTS log_tombstones_deleted_at_idx
+ON log_tombstones (deleted_at);
+
+-- Cursors at or below the horizon may have missed pruned tombstones.
+CREATE TABLE IF NOT EXISTS sync_horizons (
+name text NOT NULL PRIMARY KEY,
+horizon xid8 NOT NULL DEFAULT '0'
+);
+
+INSERT INTO sync_horizons (name)
+VALUES ('logs')
+    ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION touch_log() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    NEW.change_xid := pg_current_xact_id();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER logs_touch
+BEFORE UPDATE OF entry_date, data ON logs
+FOR EACH ROW EXECUTE FUNCTION touch_log();
+
+CREATE OR REPLACE FUNCTION record_log_tombstones() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO log_tombstones (id, student)
+    SELECT id, student FROM old_logs
+        ON CONFLICT (id) DO UPDATE SET deleted_at = now(), change_xid = pg_current_xact_id();
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER logs_delete_tombstones
+AFTER DELETE ON logs
+REFERENCING OLD TABLE AS old_logs
+FOR EACH STATEMENT EXECUTE FUNCTION record_log_tombstones();
+
+-- Rows moved out of the default partition keep their timestamps and change ids, so
+-- clients are not sent them again.
+CREATE OR REPLACE FUNCTION create_log_partition(month date) RETURNS text AS $$
+DECLARE
+    start_date date := date_trunc('month', month)::date;
+    end_date date := (date_trunc('month', month) + interval '1 month')::date;
+    partition text := 'logs_' || to_char(month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition) IS NOT NULL THEN
+        RETURN partition;
+    END IF;
+
+    -- Rows that landed in the default partition before this month existed have to move
+    -- out of it, otherwise attaching the new range fails.
+    EXECUTE format('CREATE TABLE %I (LIKE logs INCLUDING DEFAULTS INCLUDING GENERATED)', partition);
+
+    EXECUTE format(
+        'WITH moved AS ('
+        'DELETE FROM logs_default WHERE entry_date >= $1 AND entry_date < $2 '
+        'RETURNING id, entry_date, data, student, created_at, updated_at, change_xid'
+        ') INSERT INTO %I (id, entry_date, data, student, created_at, updated_at, change_xid) SELECT * FROM moved',
+        partition
+    ) USING start_date, end_date;
+
+    EXECUTE format(
+        'ALTER TABLE logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition, start_date, end_date
+    );
+
+    RETURN partition;
+END;
+$$ LANGUAGE plpgsql;
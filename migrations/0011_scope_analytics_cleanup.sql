@@ -0,0 +1,55 @@
+-- Only the (course, week) rows a delete touched can have dropped to zero.
+CREATE OR REPLACE FUNCTION update_log_analytics() RETURNS trigger AS $$
+DECLARE
+    affected varchar[] := '{}';
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE student_log_days SET log_count = student_log_days.log_count - removed.log_count
+        FROM (
+            SELECT student, entry_date, count(*) AS log_count FROM old_logs GROUP BY student, entry_date
+        ) removed
+        WHERE student_log_days.student = removed.student AND student_log_days.entry_date = removed.entry_date;
+
+        UPDATE course_week_logs SET log_count = course_week_logs.log_count - removed.log_count
+        FROM (
+            SELECT students.course, date_trunc('week', old_logs.entry_date)::date AS week, count(*) AS log_count
+            FROM old_logs JOIN students ON students.matric_num = old_logs.student
+            GROUP BY students.course, week
+        ) removed
+        WHERE course_week_logs.course = removed.course AND course_week_logs.week = removed.week;
+
+        DELETE FROM course_week_logs
+        USING (
+            SELECT DISTINCT students.course, date_trunc('week', old_logs.entry_date)::date AS week
+            FROM old_logs JOIN students ON students.matric_num = old_logs.student
+        ) removed
+        WHERE course_week_logs.course = removed.course AND course_week_logs.week = removed.week
+            AND course_week_logs.log_count <= 0;
+
+        affected := affected || ARRAY(SELECT DISTINCT student FROM old_logs);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO student_log_days (student, entry_date, log_count)
+        SELECT student, entry_date, count(*) FROM new_logs
+        GROUP BY student, entry_date
+        ORDER BY student, entry_date
+            ON CONFLICT (student, entry_date) DO UPDATE
+            SET log_count = student_log_days.log_count + excluded.log_count;
+
+        INSERT INTO course_week_logs (course, week, log_count)
+        SELECT students.course, date_trunc('week', new_logs.entry_date)::date AS week, count(*)
+        FROM new_logs JOIN students ON students.matric_num = new_logs.student
+        GROUP BY students.course, week
+        ORDER BY students.course, week
+            ON CONFLICT (course, week) DO UPDATE
+            SET log_count = course_week_logs.log_count + excluded.log_count;
+
+        affected := affected || ARRAY(SELECT DISTINCT student FROM new_logs);
+    END IF;
+
+    PERFORM refresh_student_log_summaries(affected);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
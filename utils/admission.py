@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+
+from utils import metrics
+
+# name: (concurrent requests, queued requests, seconds a queued request may wait)
+DEFAULT_BUDGETS = {
+    'login': ((os.cpu_count() or 1) * 2, (os.cpu_count() or 1) * 8, 2),
+    'write': (16, 64, 5),
+    'read': (32, 128, 5),
+    'export': (2, 4, 1)
+}
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+BUDGETS = {}
+ENDPOINTS = {}
+
+class Overloaded(Exception):
+    def __init__(self, budget, reason):
+        super().__init__(f"The {budget.name} budget is full.")
+        self.budget = budget
+        self.reason = reason
+        self.retry_after = budget.retry_after
+
+class Budget:
+    def __init__(self, name, limit, queue, timeout, retry_after=1):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+        self.lock = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def reject(self, reason):
+        self.shed += 1
+        metrics.ADMISSION_SHED.inc(self.name, reason)
+
+        return Overloaded(self, reason)
+
+    def acquire(self):
+        with self.lock:
+            if self.active >= self.limit:
+                if self.waiting >= self.queue:
+                    raise self.reject('queue_full')
+
+                deadline = time.monotonic() + self.timeout
+
+                self.waiting += 1
+                try:
+                    while self.active >= self.limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self.reject('timeout')
+
+                        self.lock.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            self.active += 1
+            self.admitted += 1
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+            self.lock.notify()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'limit': self.limit,
+                'queue': self.queue,
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'shed': self.shed
+            }
+
+def configure(config):
+    BUDGETS.clear()
+
+    for name, (limit, queue, timeout) in DEFAULT_BUDGETS.items():
+        key = name.upper()
+
+        BUDGETS[name] = Budget(
+            name,
+            config.getint('ADMISSION', f'{key}_LIMIT', fallback=limit),
+            config.getint('ADMISSION', f'{key}_QUEUE', fallback=queue),
+            config.getfloat('ADMISSION', f'{key}_TIMEOUT', fallback=timeout),
+            config.getint('ADMISSION', 'RETRY_AFTER', fallback=1)
+        )
+
+def budget(name):
+    def register(function):
+        ENDPOINTS[function.__name__] = name
+        return function
+
+    return register
+
+def get_budget(endpoint, method):
+    if endpoint is None:
+        return None
+
+    # Blueprint endpoints are prefixed with the blueprint name.
+    endpoint = endpoint.rpartition('.')[2]
+
+    if endpoint in ENDPOINTS:
+        name = ENDPOINTS[endpoint]
+    else:
+        name = 'read' if method in READ_METHODS else 'write'
+
+    return BUDGETS.get(name)
+
+def stats():
+    return {
+        f"{name}_{key}": value
+        for name, budget in BUDGETS.items()
+        for key, value in budget.stats().items()
+    }
@@ -0,0 +1,45 @@
+from utils import async_database, metrics
+from utils.authentication import PRINCIPAL_CACHE, HTTPError, cache_principal, read_token, decode_token
+
+async def get_principal(key, lookup):
+    principal = PRINCIPAL_CACHE.get(key)
+    if principal is not None:
+        return principal
+
+    return cache_principal(key, await lookup())
+
+@metrics.timed(metrics.AUTH_SECONDS, 'student')
+async def authenticate_student(config, connection, headers):
+    token = read_token(headers)
+
+    try:
+        token_data = decode_token(config, token, admin=False)
+
+        student = await get_principal(
+            ('student', token_data['id']),
+            lambda: async_database.get_student_by_matric_num(connection, token_data['id'])
+        )
+        if not student:
+            raise HTTPError(401, "Invalid token.")
+
+        return student
+    except Exception:
+        raise HTTPError(401, "Invalid token.")
+
+@metrics.timed(metrics.AUTH_SECONDS, 'admin')
+async def authenticate_admin(config, connection, headers):
+    token = read_token(headers)
+
+    try:
+        token_data = decode_token(config, token, admin=True)
+
+        admin = await get_principal(
+            ('admin', token_data['id']),
+            lambda: async_database.get_admin_by_id(connection, token_data['id'])
+        )
+        if not admin:
+            raise HTTPError(401, "Invalid token.")
+
+        return admin
+    except Exception:
+        raise HTTPError(401, "Invalid token.")
@@ -0,0 +1,306 @@
+import time
+import contextlib
+
+from psycopg import OperationalError
+from psycopg.rows import dict_row, tuple_row
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+from utils import database, metrics
+from utils.database import STREAM_BATCH_SIZE, IMPORT_BATCH_SIZE, COPY_CHUNK_SIZE
+
+class ReadPool(database.ReadPool):
+    async def getconn_replica(self, key=None):
+        if not self.use_replica(key):
+            return None
+
+        try:
+            connection = await self.replica.getconn()
+        except (OperationalError, PoolTimeout):
+            self.mark_down()
+            return None
+
+        with self.lock:
+            self.leased.add(connection)
+
+        return connection
+
+    async def getconn(self, key=None):
+        connection = await self.getconn_replica(key)
+
+        return connection if connection is not None else await self.primary.getconn()
+
+    async def putconn(self, connection):
+        with self.lock:
+            replica = connection in self.leased
+            self.leased.discard(connection)
+
+        if not replica:
+            return await self.primary.putconn(connection)
+
+        if connection.broken:
+            self.mark_down()
+
+        await self.replica.putconn(connection)
+
+    @contextlib.asynccontextmanager
+    async def connection(self, key=None):
+        connection = await self.getconn(key)
+        try:
+            yield connection
+        finally:
+            await self.putconn(connection)
+
+    def stats(self):
+        stats = self.replica.get_stats() if self.replica is not None else {}
+
+        with self.lock:
+            return dict(
+                stats,
+                down=int(time.monotonic() < self.down_until),
+                failovers=self.failovers,
+                sticky=len(self.sticky)
+            )
+
+    async def open(self):
+        if self.replica is not None:
+            await self.replica.open()
+
+    async def close(self):
+        if self.replica is not None:
+            await self.replica.close()
+
+def create_pool(config, section="DATABASE"):
+    settings = config[section]
+
+    if "DSN" in settings:
+        conninfo = settings["DSN"]
+    else:
+        conninfo = make_conninfo(
+            host=settings["HOST"],
+            port=settings.getint("PORT", fallback=5432),
+            user=settings["USER"],
+            password=settings["PASSWORD"],
+            dbname=settings["DATABASE"],
+        )
+
+    return AsyncConnectionPool(
+        conninfo,
+        min_size=settings.getint("POOL_MIN_SIZE", fallback=1),
+        max_size=settings.getint("POOL_MAX_SIZE", fallback=10),
+        timeout=settings.getfloat("POOL_TIMEOUT", fallback=30),
+        max_idle=settings.getfloat("POOL_MAX_IDLE", fallback=600),
+        kwargs={'autocommit': True},
+        check=AsyncConnectionPool.check_connection,
+        open=False
+    )
+
+def create_read_pool(config, primary):
+    replica = create_pool(config, "REPLICA") if config.has_section("REPLICA") else None
+
+    return ReadPool(config, primary, replica)
+
+def expand_values(query, rows):
+    placeholders = ", ".join("(" + ", ".join(["%s"] * len(row)) + ")" for row in rows)
+
+    return query.replace("VALUES %s", f"VALUES {placeholders}", 1), [value for row in rows for value in row]
+
+async def fetch_one(connection, query, values, row_factory=dict_row):
+    async with connection.cursor(row_factory=row_factory) as cursor:
+        await cursor.execute(query, values)
+
+        return await cursor.fetchone()
+
+async def fetch_all(connection, query, values, row_factory=dict_row):
+    async with connection.cursor(row_factory=row_factory) as cursor:
+        await cursor.execute(query, values)
+
+        return await cursor.fetchall()
+
+async def fetch_value(connection, query, values, default=None):
+    async with connection.cursor() as cursor:
+        await cursor.execute(query, values)
+        row = await cursor.fetchone()
+
+        return row[0] if row else default
+
+async def stream_rows(connection, name, query, values):
+    async with connection.transaction():
+        async with connection.cursor(name=name, row_factory=tuple_row) as cursor:
+            cursor.itersize = STREAM_BATCH_SIZE
+            await cursor.execute(query, values)
+
+            async for row in cursor:
+                yield row
+
+async def copy_rows(connection, query, values):
+    buffer = bytearray()
+
+    async with connection.cursor() as cursor:
+        async with cursor.copy(query, values) as copy:
+            async for data in copy:
+                buffer += data
+
+                if len(buffer) >= COPY_CHUNK_SIZE:
+                    yield bytes(buffer)
+                    buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+@metrics.timed_query
+async def create_student(connection, student):
+    return await fetch_value(connection, *database.create_student_query(student), default=0)
+
+@metrics.timed_query
+async def get_student_version(connection, matric_num):
+    return await fetch_value(connection, *database.student_version_query(matric_num))
+
+@metrics.timed_query
+async def get_log_version(connection, id, matric_num):
+    return await fetch_value(connection, *database.log_version_query(id, matric_num))
+
+@metrics.timed_query
+async def get_collection_version(connection, name):
+    return await fetch_value(connection, *database.collection_version_query(name), default=0)
+
+@metrics.timed_query
+async def get_course_codes(connection):
+    rows = await fetch_all(connection, *database.course_codes_query(), row_factory=tuple_row)
+
+    return {name: code for code, name in rows}
+
+@metrics.timed_query
+async def import_students(connection, students):
+    created = set()
+
+    for start in range(0, len(students), IMPORT_BATCH_SIZE):
+        query, values = expand_values(*database.import_students_query(students[start:start + IMPORT_BATCH_SIZE]))
+
+        created.update(row[0] for row in await fetch_all(connection, query, values, row_factory=tuple_row))
+
+    return created
+
+@metrics.timed_query
+async def get_students(connection, after=None, limit=None):
+    return await fetch_all(connection, *database.students_query(after, limit), row_factory=tuple_row)
+
+def stream_students(connection, after=None):
+    return stream_rows(connection, "students_stream", *database.students_query(after))
+
+@metrics.timed_query
+async def get_student_data(connection, matric_num, after=None, limit=None):
+    return await fetch_value(connection, *database.student_data_query(matric_num, after, limit))
+
+@metrics.timed_query
+async def get_student_log_data(connection, matric_num, id):
+    return await fetch_one(connection, *database.student_log_data_query(matric_num, id), row_factory=tuple_row)
+
+@metrics.timed_query
+async def get_student_by_matric_num(connection, matric_num):
+    return await fetch_one(connection, *database.student_by_matric_num_query(matric_num))
+
+@metrics.timed_query
+async def get_students_by_course(connection, course, limit=None, rank=False):
+    return await fetch_all(connection, *database.students_by_course_query(course, limit, rank), row_factory=tuple_row)
+
+@metrics.timed_query
+async def get_students_by_name(connection, name, limit=None, rank=False):
+    return await fetch_all(connection, *database.students_by_name_query(name, limit, rank), row_factory=tuple_row)
+
+@metrics.timed_query
+async def get_students_by_matric_num(connection, matric_num, limit=None, rank=False):
+    return await fetch_all(
+        connection, *database.students_by_matric_num_query(matric_num, limit, rank), row_factory=tuple_row
+    )
+
+@metrics.timed_query
+async def create_admin(connection, admin):
+    return await fetch_value(connection, *database.create_admin_query(admin), default=0)
+
+@metrics.timed_query
+async def get_admin_by_id(connection, id):
+    return await fetch_one(connection, *database.admin_by_id_query(id))
+
+@metrics.timed_query
+async def get_admin_by_name(connection, name):
+    return await fetch_one(connection, *database.admin_by_name_query(name))
+
+@metrics.timed_query
+async def add_student_log(connection, log, matric_num):
+    async with connection.cursor() as cursor:
+        await cursor.execute(*database.add_student_log_query(log, matric_num))
+
+@metrics.timed_query
+async def add_student_logs(connection, logs, matric_num):
+    query, values = expand_values(*database.add_student_logs_query(logs, matric_num))
+
+    return [row[0] for row in await fetch_all(connection, query, values, row_factory=tuple_row)]
+
+@metrics.timed_query
+async def get_student_logs(connection, matric_num, after=None, limit=None):
+    return await fetch_all(connection, *database.student_logs_query(matric_num, after, limit), row_factory=tuple_row)
+
+def stream_student_logs(connection, matric_num, after=None):
+    return stream_rows(connection, "student_logs_stream", *database.student_logs_query(matric_num, after))
+
+@metrics.timed_query
+async def sync_student_logs(connection, matric_num, since):
+    async with connection.transaction():
+        async with connection.cursor() as cursor:
+            await cursor.execute(database.SNAPSHOT_TRANSACTION)
+
+        next_cursor = await fetch_value(connection, *database.sync_cursor_query())
+
+        deleted = []
+        if since:
+            if since <= await fetch_value(connection, *database.sync_horizon_query('logs')):
+                return None
+
+            rows = await fetch_all(connection, *database.deleted_logs_query(matric_num, since), row_factory=tuple_row)
+            deleted = [row[0] for row in rows]
+
+        logs = await fetch_all(connection, *database.changed_logs_query(matric_num, since), row_factory=tuple_row)
+
+    return logs, deleted, next_cursor
+
+@metrics.timed_query
+async def get_student_log(connection, id, matric_num):
+    return await fetch_one(connection, *database.student_log_query(id, matric_num), row_factory=tuple_row)
+
+@metrics.timed_query
+async def delete_log(connection, id, matric_num):
+    async with connection.cursor() as cursor:
+        await cursor.execute(*database.delete_log_query(id, matric_num))
+
+        return cursor.rowcount
+
+@metrics.timed_query
+async def get_course_week_logs(connection, start, end, course=None):
+    return await fetch_all(connection, *database.course_week_logs_query(start, end, course), row_factory=tuple_row)
+
+@metrics.timed_query
+async def get_student_activity(connection, start, end, course=None, missing=False, after=None, limit=None):
+    return await fetch_all(
+        connection, *database.student_activity_query(start, end, course, missing, after, limit), row_factory=tuple_row
+    )
+
+@metrics.timed_query
+async def search_logs(connection, terms, start, end, course=None, after=None, limit=None, candidates=None):
+    return await fetch_all(
+        connection, *database.search_logs_query(terms, start, end, course, after, limit, candidates),
+        row_factory=tuple_row
+    )
+
+def stream_logs_export(connection, format, course=None, start=None, end=None):
+    return copy_rows(connection, *database.export_logs_query(format, course, start, end))
+
+@metrics.timed_query
+async def create_job(connection, kind, params, created_by=None, max_attempts=3):
+    return await fetch_one(
+        connection, *database.create_job_query(kind, params, created_by, max_attempts), row_factory=tuple_row
+    )
+
+@metrics.timed_query
+async def get_job(connection, id):
+    return await fetch_one(connection, *database.job_query(id), row_factory=tuple_row)
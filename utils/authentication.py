@@ -1,29 +1,72 @@
 import jwt
 
-from utils import database
+from utils import database, metrics
+from utils.cache import TTLCache
 from flask import request
 
+PRINCIPAL_CACHE = TTLCache()
+
 class HTTPError(Exception):
     def __init__(self, code, message):
         self.code = code
         self.message = message
 
-def authenticate_student(config, connection):
+def configure_cache(config):
+    # Only principals that exist are cached and nothing in the API changes or removes
+    # one, so entries are never invalidated. A student or admin changed directly in
+    # the database is seen by each process within PRINCIPAL_TTL seconds.
+    PRINCIPAL_CACHE.max_size = config.getint('CACHE', 'PRINCIPAL_MAX_SIZE', fallback=1024)
+    PRINCIPAL_CACHE.ttl = config.getfloat('CACHE', 'PRINCIPAL_TTL', fallback=60)
+    PRINCIPAL_CACHE.clear()
+
+def cache_principal(key, principal):
+    if not principal:
+        return None
+
+    principal = {name: value for name, value in principal.items() if name != 'password'}
+    PRINCIPAL_CACHE.set(key, principal)
+
+    return principal
+
+def get_principal(key, lookup):
+    principal = PRINCIPAL_CACHE.get(key)
+    if principal is not None:
+        return principal
+
+    return cache_principal(key, lookup())
+
+def read_token(headers):
     token = None
 
-    header = request.headers.get("Authorization")
+    header = headers.get("Authorization")
     if header:
         token = header.split(' ')[1]
 
     if not token:
         raise HTTPError(401, "Missing token.")
 
-    try:
+    return token
+
+def decode_token(config, token, admin):
+    with metrics.timer(metrics.TOKEN_SECONDS):
         token_data = jwt.decode(jwt=token, key=config['JWT']['SECRET_KEY'], algorithms=['HS256'])
-        if token_data['admin'] is True:
-            raise HTTPError(401, "Invalid token.")
 
-        student = database.get_student_by_matric_num(connection, token_data['id'])
+    if token_data['admin'] is not admin:
+        raise HTTPError(401, "Invalid token.")
+
+    return token_data
+
+@metrics.timed(metrics.AUTH_SECONDS, 'student')
+def authenticate_student(config, connection):
+    token = read_token(request.headers)
+
+    try:
+        token_data = decode_token(config, token, admin=False)
+
+        student = get_principal(
+            ('student', token_data['id']),
+            lambda: database.get_student_by_matric_num(connection, token_data['id'])
+        )
         if not student:
             raise HTTPError(401, "Invalid token.")
 
@@ -31,25 +74,20 @@ def authenticate_student(config, connection):
     except:
         raise HTTPError(401, "Invalid token.")
 
+@metrics.timed(metrics.AUTH_SECONDS, 'admin')
 def authenticate_admin(config, connection):
-    token = None
-
-    header = request.headers.get("Authorization")
-    if header:
-        token = header.split(' ')[1]
-
-    if not token:
-        raise HTTPError(401, "Missing token.")
+    token = read_token(request.headers)
 
     try:
-        token_data = jwt.decode(jwt=token, key=config['JWT']['SECRET_KEY'], algorithms=['HS256'])
-        if token_data['admin'] is False:
-            raise HTTPError(401, "Invalid token.")
+        token_data = decode_token(config, token, admin=True)
 
-        admin = database.get_admin_by_id(connection, token_data['id'])
+        admin = get_principal(
+            ('admin', token_data['id']),
+            lambda: database.get_admin_by_id(connection, token_data['id'])
+        )
         if not admin:
             raise HTTPError(401, "Invalid token.")
 
         return admin
     except:
-        raise HTTPError(401, "Invalid token.")
\ No newline at end of file
+        raise HTTPError(401, "Invalid token.")
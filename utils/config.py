@@ -1,10 +1,14 @@
+import os
 import configparser
 
-def load_config():
-    try:
-        config = configparser.ConfigParser()
-        config.read('config.ini')
+CONFIG_ENV = 'SIWES_CONFIG'
+DEFAULT_PATH = 'config.ini'
 
-        return config
-    except configparser.Error():
-        raise
\ No newline at end of file
+def load_config(path=None):
+    path = path or os.environ.get(CONFIG_ENV) or DEFAULT_PATH
+
+    config = configparser.ConfigParser()
+    if not config.read(path):
+        raise FileNotFoundError(f"Config file {path} not found. Set {CONFIG_ENV} to its path.")
+
+    return config
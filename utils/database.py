@@ -1,87 +1,435 @@
+import os
+import re
+import json
+import time
+import queue
+import itertools
+import threading
+import contextlib
+
 import psycopg2
 import psycopg2.extras
+import psycopg2.extensions
+
+from utils import metrics
+
+STREAM_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+COPY_CHUNK_SIZE = 64 * 1024
+COPY_QUEUE_SIZE = 8
+STICKY_PRUNE_SIZE = 10000
+JSON_DATE_FORMAT = 'Dy, DD Mon YYYY "00:00:00 GMT"'
+JSON_TIMESTAMP_FORMAT = 'Dy, DD Mon YYYY HH24:MI:SS "GMT"'
+HEADLINE_OPTIONS = 'MaxFragments=2, MaxWords=20, MinWords=8'
+JOB_COLUMNS = "id, kind, status, params, attempts, max_attempts, progress_done, progress_total, result, error, "\
+              "created_at, run_at, started_at, finished_at"
+SEARCH_LOGS_FILTER = "logs.search @@ websearch_to_tsquery('english', %(terms)s) "\
+                     "AND logs.entry_date BETWEEN %(start)s::date AND %(end)s::date "\
+                     "AND (%(course)s::text IS NULL OR logs.student IN ("\
+                     "SELECT students.matric_num FROM students "\
+                     "JOIN courses ON students.course = courses.code "\
+                     "WHERE courses.name = %(course)s"\
+                     "))"
+EXPORT_LOGS_FILTER = "(%(course)s::text IS NULL OR courses.name = %(course)s) "\
+                     "AND (%(start)s::date IS NULL OR logs.entry_date >= %(start)s::date) "\
+                     "AND (%(end)s::date IS NULL OR logs.entry_date <= %(end)s::date)"
+SNAPSHOT_TRANSACTION = "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"
+
+PREPARED_STATEMENTS = {}
+
+class PoolTimeout(Exception):
+    pass
+
+class PreparedConnection(psycopg2.extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+class ConnectionPool:
+    def __init__(self, config, section="DATABASE"):
+        self.config = config
+        self.section = section
+
+        settings = config[section]
+        self.min_size = settings.getint("POOL_MIN_SIZE", fallback=1)
+        self.max_size = settings.getint("POOL_MAX_SIZE", fallback=10)
+        self.timeout = settings.getfloat("POOL_TIMEOUT", fallback=30)
+        self.check_interval = settings.getfloat("POOL_CHECK_INTERVAL", fallback=30)
+
+        self.pid = None
+        self.fork_lock = threading.Lock()
+        self.inherited = []
+
+        self.lock = threading.Condition()
+        self.idle = []
+        self.size = 0
+        self.waiting = 0
+        self.timeouts = 0
+
+    def open(self):
+        with self.fork_lock:
+            if self.pid == os.getpid():
+                return
+
+            # Connections opened before a fork share their sockets with the parent.
+            # Closing them (or letting them be collected) would end the parent's
+            # sessions, so the child only keeps them referenced.
+            self.inherited.extend(connection for connection, _ in self.idle)
+
+            self.lock = threading.Condition()
+            self.idle = [
+                (connect_to_db(self.config, section=self.section), time.monotonic())
+                for _ in range(self.min_size)
+            ]
+            self.size = len(self.idle)
+            self.waiting = 0
+            self.pid = os.getpid()
+
+    def get_connection(self):
+        if self.pid != os.getpid():
+            self.open()
+
+        deadline = time.monotonic() + self.timeout
+
+        with self.lock:
+            while not self.idle and self.size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout("Timed out waiting for a database connection.")
+
+                self.waiting += 1
+                try:
+                    self.lock.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            if self.idle:
+                connection, last_used = self.idle.pop()
+            else:
+                connection, last_used = None, None
+                self.size += 1
+
+        if connection is not None:
+            if self.is_alive(connection, last_used):
+                return connection
+
+            connection.close()
+
+        try:
+            return connect_to_db(self.config, section=self.section)
+        except Exception:
+            with self.lock:
+                self.size -= 1
+                self.lock.notify()
+            raise
+
+    def put_connection(self, connection):
+        if not connection.closed:
+            status = connection.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                connection.close()
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    connection.close()
+
+        with self.lock:
+            if connection.closed:
+                self.size -= 1
+            else:
+                self.idle.append((connection, time.monotonic()))
+
+            self.lock.notify()
+
+    def is_alive(self, connection, last_used):
+        if connection.closed:
+            return False
+
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': self.size,
+                'idle': len(self.idle),
+                'max_size': self.max_size,
+                'waiting': self.waiting,
+                'timeouts': self.timeouts
+            }
+
+    @contextlib.contextmanager
+    def checkout(self):
+        connection = self.get_connection()
+        try:
+            yield connection
+        finally:
+            self.put_connection(connection)
+
+    def close(self):
+        with self.lock:
+            for connection, _ in self.idle:
+                connection.close()
+
+            self.size -= len(self.idle)
+            self.idle = []
+
+class ReadPool:
+    def __init__(self, config, primary, replica=None):
+        self.primary = primary
+        self.replica = replica
+        self.sticky_seconds = config.getfloat("REPLICA", "STICKY_SECONDS", fallback=5)
+        self.retry_interval = config.getfloat("REPLICA", "RETRY_INTERVAL", fallback=10)
+
+        self.lock = threading.Lock()
+        self.sticky = {}
+        self.leased = set()
+        self.down_until = 0
+        self.failovers = 0
+
+    def stick(self, key):
+        now = time.monotonic()
+
+        with self.lock:
+            if len(self.sticky) >= STICKY_PRUNE_SIZE:
+                self.sticky = {key: until for key, until in self.sticky.items() if until > now}
+
+            self.sticky[key] = now + self.sticky_seconds
+
+    def use_replica(self, key=None):
+        if self.replica is None:
+            return False
+
+        now = time.monotonic()
+
+        with self.lock:
+            if now < self.down_until:
+                return False
+
+            return key is None or self.sticky.get(key, 0) <= now
+
+    def mark_down(self):
+        with self.lock:
+            self.down_until = time.monotonic() + self.retry_interval
+            self.failovers += 1
+
+    def get_replica_connection(self, key=None):
+        if not self.use_replica(key):
+            return None
+
+        try:
+            connection = self.replica.get_connection()
+        except psycopg2.OperationalError:
+            self.mark_down()
+            return None
+
+        with self.lock:
+            self.leased.add(connection)
+
+        return connection
+
+    def get_connection(self, key=None):
+        connection = self.get_replica_connection(key)
+
+        return connection if connection is not None else self.primary.get_connection()
+
+    def put_connection(self, connection):
+        with self.lock:
+            replica = connection in self.leased
+            self.leased.discard(connection)
+
+        if not replica:
+            return self.primary.put_connection(connection)
+
+        if connection.closed == 2:
+            self.mark_down()
+
+        self.replica.put_connection(connection)
+
+    @contextlib.contextmanager
+    def checkout(self, key=None):
+        connection = self.get_connection(key)
+        try:
+            yield connection
+        finally:
+            self.put_connection(connection)
+
+    def stats(self):
+        stats = self.replica.stats() if self.replica is not None else {}
+
+        with self.lock:
+            return dict(
+                stats,
+                down=int(time.monotonic() < self.down_until),
+                failovers=self.failovers,
+                sticky=len(self.sticky)
+            )
+
+    def close(self):
+        if self.replica is not None:
+            self.replica.close()
 
-def connect_to_db(config):
+def create_pool(config):
+    return ConnectionPool(config)
+
+def create_read_pool(config, primary):
+    replica = ConnectionPool(config, "REPLICA") if config.has_section("REPLICA") else None
+
+    return ReadPool(config, primary, replica)
+
+def stream_rows(connection, name, query, values):
     try:
-        connection = psycopg2.connect(
-            host=config["DATABASE"]["HOST"],
-            user=config["DATABASE"]["USER"],
-            password=config["DATABASE"]["PASSWORD"],
-            dbname=config["DATABASE"]["DATABASE"],
-        )
+        with connection.cursor(name=name) as cursor:
+            cursor.itersize = STREAM_BATCH_SIZE
+            cursor.execute(query, values)
 
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS admins (
-                id SERIAL PRIMARY KEY,
-                name text NOT NULL,
-                password text NOT NULL
-                );
-            """)
+            yield from cursor
 
-            connection.commit()
+        connection.commit()
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS courses (
-                code varchar(10) NOT NULL PRIMARY KEY,
-                name text NOT NULL
-                );
-            """)
+class CopyCancelled(Exception):
+    pass
 
-            connection.commit()
+class QueueWriter:
+    def __init__(self, chunks, cancelled, chunk_size=COPY_CHUNK_SIZE):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
 
-            cursor.execute("""
-                INSERT INTO courses (code, name)
-                VALUES ('CS', 'Computer Science'),
-                    ('SE', 'Software Engineering'),
-                    ('IT', 'Information Technology'),
-                    ('CT', 'Computer Technology'),
-                    ('CIS', 'Computer Information Systems')
-                    ON CONFLICT (code) DO NOTHING;;
-            """)
+    def put(self, item):
+        while True:
+            if self.cancelled.is_set():
+                raise CopyCancelled()
 
-            connection.commit()
+            try:
+                self.chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                pass
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS students (
-                matric_num varchar(10) NOT NULL PRIMARY KEY,
-                password text NOT NULL,
-                last_name text NOT NULL,
-                first_name text NOT NULL,
-                middle_name text,
-                course varchar(10) NOT NULL,
-                FOREIGN KEY (course) REFERENCES courses (code)
-                );
-            """)
+    def write(self, data):
+        self.buffer += data
 
-            connection.commit()
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS logs (
-                id SERIAL PRIMARY KEY,
-                entry_date date NOT NULL,
-                data text NOT NULL,
-                student varchar(10) NOT NULL,
-                FOREIGN KEY (student) REFERENCES students (matric_num)
-                );
-            """)
+    def flush(self):
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
 
-            connection.commit()
+def copy_to(connection, query, values, file):
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(cursor.mogrify(query, values).decode(), file)
 
-        return connection
-    except Exception as e:
-        print(e)
+        connection.commit()
+    except CopyCancelled:
+        connection.cancel()
+        connection.close()
         raise
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
 
-def create_student(connection, student):
-    student_exists = get_student_by_matric_num(connection, student['matric_num'])
-    if student_exists:
-        return 0
+def stream_copy(pool, query, values):
+    chunks = queue.Queue(maxsize=COPY_QUEUE_SIZE)
+    cancelled = threading.Event()
+    done = object()
+
+    def produce():
+        writer = QueueWriter(chunks, cancelled)
+
+        try:
+            with pool.checkout() as connection:
+                copy_to(connection, query, values, writer)
+
+            writer.flush()
+            writer.put(done)
+        except CopyCancelled:
+            pass
+        except Exception as error:
+            try:
+                writer.put(error)
+            except CopyCancelled:
+                pass
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is done:
+                return
+
+            if isinstance(chunk, Exception):
+                raise chunk
+
+            yield chunk
+    finally:
+        cancelled.set()
+
+def prepared(builder):
+    PREPARED_STATEMENTS[builder.__name__] = builder.__name__[:-len('_query')]
+
+    return builder
+
+def positional(query):
+    numbers = itertools.count(1)
+
+    return re.sub(r'%%|%s', lambda match: '%' if match.group() == '%%' else f"${next(numbers)}", query)
+
+def execute(cursor, builder, *args):
+    query, values = builder(*args)
+
+    name = PREPARED_STATEMENTS.get(builder.__name__)
+    if name is None or not isinstance(cursor.connection, PreparedConnection):
+        cursor.execute(query, values)
+        return
 
+    if name not in cursor.connection.prepared:
+        cursor.execute(f"PREPARE {name} AS {positional(query)}")
+        cursor.connection.prepared.add(name)
+
+    cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(values))})", values)
+
+def connect_to_db(config, connection_factory=PreparedConnection, section="DATABASE"):
+    settings = config[section]
+
+    if "DSN" in settings:
+        return psycopg2.connect(settings["DSN"], connection_factory=connection_factory)
+
+    return psycopg2.connect(
+        host=settings["HOST"],
+        port=settings.getint("PORT", fallback=5432),
+        user=settings["USER"],
+        password=settings["PASSWORD"],
+        dbname=settings["DATABASE"],
+        connection_factory=connection_factory
+    )
+
+def create_student_query(student):
     query = "INSERT INTO students(matric_num, password, first_name, last_name, middle_name, course) "\
             "VALUES (%s, %s, %s, %s, %s, "\
             "(SELECT code FROM courses WHERE name = %s)"\
-            ");"
+            ") "\
+            "ON CONFLICT (matric_num) DO NOTHING "\
+            "RETURNING matric_num"
 
     values = (
         student['matric_num'],
@@ -92,50 +440,288 @@ def create_student(connection, student):
         student['course']
     )
 
+    return query, values
+
+@metrics.timed_query
+def create_student(connection, student):
+    query, values = create_student_query(student)
+
     try:
         with connection.cursor() as cursor:
             cursor.execute(query, values)
+            row = cursor.fetchone()
 
         connection.commit()
+
+        return row[0] if row else 0
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def student_version_query(matric_num):
+    query = "SELECT version FROM students WHERE matric_num = %s"
+
+    values = (matric_num,)
+
+    return query, values
+
+@metrics.timed_query
+def get_student_version(connection, matric_num):
+    query, values = student_version_query(matric_num)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            row = cursor.fetchone()
+
+            return row[0] if row else None
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def student_log_dates(student):
+    return "logs.entry_date BETWEEN "\
+           f"(SELECT first_entry_date FROM student_log_summaries WHERE student = {student}) AND "\
+           f"(SELECT last_entry_date FROM student_log_summaries WHERE student = {student})"
+
+def log_version_query(id, matric_num):
+    query = "SELECT students.version FROM logs "\
+            "JOIN students ON logs.student = students.matric_num "\
+            "WHERE logs.id = %(id)s AND logs.student = %(matric_num)s "\
+            f"AND {student_log_dates('%(matric_num)s')}"
+
+    values = {
+        'id': id,
+        'matric_num': matric_num
+    }
+
+    return query, values
+
+@metrics.timed_query
+def get_log_version(connection, id, matric_num):
+    query, values = log_version_query(id, matric_num)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            row = cursor.fetchone()
+
+            return row[0] if row else None
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def collection_version_query(name):
+    query = "SELECT version FROM collection_versions WHERE name = %s"
+
+    values = (name,)
+
+    return query, values
+
+@metrics.timed_query
+def get_collection_version(connection, name):
+    query, values = collection_version_query(name)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            row = cursor.fetchone()
+
+            return row[0] if row else 0
     except psycopg2.Error as error:
         connection.rollback()
         raise error
 
-def get_students(connection):
+def course_codes_query():
+    query = "SELECT code, name FROM courses"
+
+    return query, ()
+
+@metrics.timed_query
+def get_course_codes(connection):
+    query, values = course_codes_query()
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+
+            return {name: code for code, name in cursor.fetchall()}
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def import_students_query(students):
+    query = "INSERT INTO students (matric_num, password, first_name, last_name, middle_name, course) "\
+            "VALUES %s "\
+            "ON CONFLICT (matric_num) DO NOTHING "\
+            "RETURNING matric_num"
+
+    values = [
+        (
+            student['matric_num'],
+            student['password'],
+            student['first_name'],
+            student['last_name'],
+            student['middle_name'],
+            student['course']
+        ) for student in students
+    ]
+
+    return query, values
+
+@metrics.timed_query
+def import_students(connection, students):
+    created = set()
+
+    for start in range(0, len(students), IMPORT_BATCH_SIZE):
+        query, values = import_students_query(students[start:start + IMPORT_BATCH_SIZE])
+
+        try:
+            with connection.cursor() as cursor:
+                rows = psycopg2.extras.execute_values(cursor, query, values, page_size=len(values), fetch=True)
+
+            connection.commit()
+        except psycopg2.Error as error:
+            connection.rollback()
+            raise error
+
+        created.update(row[0] for row in rows)
+
+    return created
+
+def students_query(after=None, limit=None):
     query = "SELECT students.matric_num, students.first_name, students.last_name, students.middle_name, "\
             "courses.name as course_name FROM students "\
-            "JOIN courses ON students.course = courses.code"
+            "JOIN courses ON students.course = courses.code "\
+            "WHERE (%s::varchar IS NULL OR students.matric_num > %s) "\
+            "ORDER BY students.matric_num "\
+            "LIMIT %s"
+
+    values = (after, after, limit)
+
+    return query, values
+
+@metrics.timed_query
+def get_students(connection, after=None, limit=None):
+    query, values = students_query(after, limit)
 
     try:
-        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-            cursor.execute(query)
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
 
             return cursor.fetchall()
     except psycopg2.Error as error:
         connection.rollback()
         raise error
 
-def get_student_data(connection, matric_num):
-    query = "SELECT students.matric_num, students.first_name, students.last_name, students.middle_name, "\
-            "courses.name as course_name, "\
-            "logs.id as id, logs.entry_date as entry_date, logs.data as data "\
-            "FROM students "\
+def stream_students(connection, after=None):
+    query, values = students_query(after)
+
+    return stream_rows(connection, "students_stream", query, values)
+
+def student_data_query(matric_num, after=None, limit=None):
+    student = "json_build_object("\
+              "'course', courses.name, "\
+              "'first_name', students.first_name, "\
+              "'last_name', students.last_name, "\
+              "'logs', ("\
+              "SELECT coalesce(json_agg(json_build_object("\
+              "'created_at', to_char(page.created_at AT TIME ZONE 'UTC', %(timestamp_format)s), "\
+              "'data', page.data, "\
+              "'entry_date', to_char(page.entry_date, %(date_format)s), "\
+              "'id', page.id, "\
+              "'updated_at', to_char(page.updated_at AT TIME ZONE 'UTC', %(timestamp_format)s)"\
+              ") ORDER BY page.id), '[]') "\
+              "FROM (SELECT * FROM page ORDER BY id LIMIT %(limit)s) page"\
+              "), "\
+              "'matric_num', students.matric_num, "\
+              "'middle_name', students.middle_name"\
+              ")"
+
+    if limit is None:
+        response = f"json_build_object('student', {student})"
+    else:
+        response = "json_build_object("\
+                   "'next', CASE WHEN (SELECT count(*) FROM page) > %(limit)s "\
+                   "THEN (SELECT id FROM page ORDER BY id OFFSET %(limit)s::integer - 1 LIMIT 1) END, "\
+                   f"'student', {student}"\
+                   ")"
+
+    query = "WITH page AS ("\
+            "SELECT id, entry_date, data, created_at, updated_at FROM logs "\
+            "WHERE student = %(matric_num)s AND (%(after)s::integer IS NULL OR id > %(after)s) "\
+            f"AND {student_log_dates('%(matric_num)s')} "\
+            "ORDER BY id "\
+            "LIMIT %(limit)s::integer + 1"\
+            ") "\
+            f"SELECT {response}::text FROM students "\
             "JOIN courses ON students.course = courses.code "\
-            "JOIN logs ON students.matric_num = logs.student "\
-            "WHERE students.matric_num = %s"
+            "WHERE students.matric_num = %(matric_num)s"
 
-    values = (matric_num,)
+    values = {
+        'matric_num': matric_num,
+        'after': after,
+        'limit': limit,
+        'date_format': JSON_DATE_FORMAT,
+        'timestamp_format': JSON_TIMESTAMP_FORMAT
+    }
+
+    return query, values
+
+@metrics.timed_query
+def get_student_data(connection, matric_num, after=None, limit=None):
+    query, values = student_data_query(matric_num, after, limit)
 
     try:
-        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+        with connection.cursor() as cursor:
             cursor.execute(query, values)
 
-            return cursor.fetchall()
+            row = cursor.fetchone()
+
+            return row[0] if row else None
     except psycopg2.Error as error:
         connection.rollback()
         raise error
 
-def get_student_by_matric_num(connection, matric_num):
+def student_log_data_query(matric_num, id):
+    query = "SELECT json_build_object('log', log)::text, log IS NOT NULL FROM students "\
+            "LEFT JOIN LATERAL ("\
+            "SELECT json_build_object("\
+            "'created_at', to_char(logs.created_at AT TIME ZONE 'UTC', %(timestamp_format)s), "\
+            "'data', logs.data, "\
+            "'entry_date', to_char(logs.entry_date, %(date_format)s), "\
+            "'id', logs.id, "\
+            "'updated_at', to_char(logs.updated_at AT TIME ZONE 'UTC', %(timestamp_format)s)"\
+            ") AS log FROM logs "\
+            "WHERE logs.id = %(id)s AND logs.student = %(matric_num)s "\
+            f"AND {student_log_dates('%(matric_num)s')}"\
+            ") log ON true "\
+            "WHERE students.matric_num = %(matric_num)s"
+
+    values = {
+        'id': id,
+        'matric_num': matric_num,
+        'date_format': JSON_DATE_FORMAT,
+        'timestamp_format': JSON_TIMESTAMP_FORMAT
+    }
+
+    return query, values
+
+@metrics.timed_query
+def get_student_log_data(connection, matric_num, id):
+    query, values = student_log_data_query(matric_num, id)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+
+            return cursor.fetchone()
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+@prepared
+def student_by_matric_num_query(matric_num):
     query = "SELECT students.matric_num, students.first_name, students.last_name, students.middle_name, "\
             "students.password, courses.name as course_name FROM students "\
             "JOIN courses ON students.course = courses.code "\
@@ -143,25 +729,45 @@ def get_student_by_matric_num(connection, matric_num):
 
     values = (matric_num,)
 
+    return query, values
+
+@metrics.timed_query
+def get_student_by_matric_num(connection, matric_num):
     try:
         with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-            cursor.execute(query, values)
+            execute(cursor, student_by_matric_num_query, matric_num)
 
             return cursor.fetchone()
     except psycopg2.Error as error:
         connection.rollback()
         raise error
 
-def get_students_by_course(connection, course):
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def students_by_course_query(course, limit=None, rank=False):
     query = "SELECT students.matric_num, students.first_name, students.last_name, students.middle_name, "\
             "courses.name as course_name FROM students "\
             "JOIN courses ON students.course = courses.code "\
-            "WHERE courses.name ILIKE %s"
+            "WHERE students.course IN (SELECT code FROM courses WHERE name ILIKE %s) "
+
+    values = [f"%{escape_like(course)}%"]
+
+    if rank:
+        query += "ORDER BY word_similarity(%s, courses.name) DESC, students.matric_num "
+        values.append(course)
 
-    values = (f"%{course}%",)
+    query += "LIMIT %s"
+    values.append(limit)
+
+    return query, values
+
+@metrics.timed_query
+def get_students_by_course(connection, course, limit=None, rank=False):
+    query, values = students_by_course_query(course, limit, rank)
 
     try:
-        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+        with connection.cursor() as cursor:
             cursor.execute(query, values)
 
             return cursor.fetchall()
@@ -169,16 +775,32 @@ def get_students_by_course(connection, course):
         connection.rollback()
         raise error
 
-def get_students_by_name(connection, name):
+def students_by_name_query(name, limit=None, rank=False):
     query = "SELECT students.matric_num, students.first_name, students.last_name, students.middle_name, "\
             "courses.name as course_name FROM students "\
             "JOIN courses ON students.course = courses.code "\
-            "WHERE (students.first_name ILIKE %s OR students.last_name ILIKE %s OR students.middle_name ILIKE %s)"
+            "WHERE (students.first_name ILIKE %s OR students.last_name ILIKE %s OR students.middle_name ILIKE %s) "
+
+    pattern = f"%{escape_like(name)}%"
+    values = [pattern, pattern, pattern]
+
+    if rank:
+        query += "ORDER BY greatest(word_similarity(%s, students.first_name), "\
+                 "word_similarity(%s, students.last_name), "\
+                 "word_similarity(%s, coalesce(students.middle_name, ''))) DESC, students.matric_num "
+        values.extend([name, name, name])
 
-    values = (f"%{name}%", f"%{name}%", f"%{name}%")
+    query += "LIMIT %s"
+    values.append(limit)
+
+    return query, values
+
+@metrics.timed_query
+def get_students_by_name(connection, name, limit=None, rank=False):
+    query, values = students_by_name_query(name, limit, rank)
 
     try:
-        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+        with connection.cursor() as cursor:
             cursor.execute(query, values)
 
             return cursor.fetchall()
@@ -186,16 +808,29 @@ def get_students_by_name(connection, name):
         connection.rollback()
         raise error
 
-def get_students_by_matric_num(connection, matric_num):
+def students_by_matric_num_query(matric_num, limit=None, rank=False):
     query = "SELECT students.matric_num, students.first_name, students.last_name, students.middle_name, "\
             "courses.name as course_name FROM students "\
             "JOIN courses ON students.course = courses.code "\
-            "WHERE students.matric_num ILIKE %s"
+            "WHERE students.matric_num ILIKE %s "
+
+    values = [f"%{escape_like(matric_num)}%"]
+
+    if rank:
+        query += "ORDER BY similarity(%s, students.matric_num) DESC, students.matric_num "
+        values.append(matric_num)
 
-    values = (f"%{matric_num}%",)
+    query += "LIMIT %s"
+    values.append(limit)
+
+    return query, values
+
+@metrics.timed_query
+def get_students_by_matric_num(connection, matric_num, limit=None, rank=False):
+    query, values = students_by_matric_num_query(matric_num, limit, rank)
 
     try:
-        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+        with connection.cursor() as cursor:
             cursor.execute(query, values)
 
             return cursor.fetchall()
@@ -203,46 +838,62 @@ def get_students_by_matric_num(connection, matric_num):
         connection.rollback()
         raise error
 
-def create_admin(connection, admin):
-    cursor = connection.cursor()
-
-    admin_exists = get_admin_by_name(connection, admin['name'])
-    if admin_exists:
-        return 0
-
+def create_admin_query(admin):
     query = "INSERT INTO admins (name, password) "\
-            "VALUES (%s, %s);"
+            "VALUES (%s, %s) "\
+            "ON CONFLICT (name) DO NOTHING "\
+            "RETURNING id"
 
     values = (admin['name'], admin['password'])
 
+    return query, values
+
+@metrics.timed_query
+def create_admin(connection, admin):
+    query, values = create_admin_query(admin)
+
     try:
         with connection.cursor() as cursor:
             cursor.execute(query, values)
+            row = cursor.fetchone()
 
         connection.commit()
+
+        return row[0] if row else 0
     except psycopg2.Error as error:
         connection.rollback()
         raise error
 
-def get_admin_by_id(connection, id):
+@prepared
+def admin_by_id_query(id):
     query = "SELECT * FROM admins WHERE id = %s"
 
     values = (id,)
 
+    return query, values
+
+@metrics.timed_query
+def get_admin_by_id(connection, id):
     try:
         with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-            cursor.execute(query, values)
+            execute(cursor, admin_by_id_query, id)
 
             return cursor.fetchone()
     except psycopg2.Error as error:
         connection.rollback()
         raise error
 
-def get_admin_by_name(connection, name):
+def admin_by_name_query(name):
     query = "SELECT * FROM admins WHERE name = %s"
 
     values = (name,)
 
+    return query, values
+
+@metrics.timed_query
+def get_admin_by_name(connection, name):
+    query, values = admin_by_name_query(name)
+
     try:
         with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
             cursor.execute(query, values)
@@ -252,27 +903,261 @@ def get_admin_by_name(connection, name):
         connection.rollback()
         raise error
 
-def add_student_log(connection, log, matric_num):
+@prepared
+def add_student_log_query(log, matric_num):
     query = "INSERT INTO logs (entry_date, data, student) VALUES (%s, %s, %s)"
 
     values = (log['entry_date'], log['data'], matric_num)
 
+    return query, values
+
+@metrics.timed_query
+def add_student_log(connection, log, matric_num):
+    try:
+        with connection.cursor() as cursor:
+            execute(cursor, add_student_log_query, log, matric_num)
+
+        connection.commit()
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def add_student_logs_query(logs, matric_num):
+    query = "INSERT INTO logs (entry_date, data, student) VALUES %s RETURNING id"
+
+    values = [(log['entry_date'], log['data'], matric_num) for log in logs]
+
+    return query, values
+
+@metrics.timed_query
+def add_student_logs(connection, logs, matric_num):
+    query, values = add_student_logs_query(logs, matric_num)
+
+    try:
+        with connection.cursor() as cursor:
+            rows = psycopg2.extras.execute_values(cursor, query, values, page_size=len(values), fetch=True)
+
+        connection.commit()
+
+        return [row[0] for row in rows]
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+@prepared
+def student_logs_query(matric_num, after=None, limit=None):
+    query = "SELECT id, entry_date, data, created_at, updated_at FROM logs "\
+            "WHERE student = %s AND (%s::integer IS NULL OR id > %s) "\
+            f"AND {student_log_dates('%s')} "\
+            "ORDER BY id "\
+            "LIMIT %s"
+
+    values = (matric_num, after, after, matric_num, matric_num, limit)
+
+    return query, values
+
+@metrics.timed_query
+def get_student_logs(connection, matric_num, after=None, limit=None):
+    try:
+        with connection.cursor() as cursor:
+            execute(cursor, student_logs_query, matric_num, after, limit)
+
+            return cursor.fetchall()
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def stream_student_logs(connection, matric_num, after=None):
+    query, values = student_logs_query(matric_num, after)
+
+    return stream_rows(connection, "student_logs_stream", query, values)
+
+def sync_cursor_query():
+    # Every transaction below the snapshot's xmin has finished, so no change with a
+    # smaller id can still become visible after this read.
+    query = "SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+    return query, ()
+
+def sync_horizon_query(name):
+    query = "SELECT horizon::text::bigint FROM sync_horizons WHERE name = %s"
+
+    values = (name,)
+
+    return query, values
+
+def changed_logs_query(matric_num, since):
+    query = "SELECT id, entry_date, data, created_at, updated_at FROM logs "\
+            "WHERE student = %(matric_num)s AND change_xid >= %(since)s::text::xid8 "\
+            f"AND {student_log_dates('%(matric_num)s')} "\
+            "ORDER BY id"
+
+    values = {
+        'matric_num': matric_num,
+        'since': since
+    }
+
+    return query, values
+
+def deleted_logs_query(matric_num, since):
+    query = "SELECT id FROM log_tombstones "\
+            "WHERE student = %(matric_num)s AND change_xid >= %(since)s::text::xid8 "\
+            "ORDER BY id"
+
+    values = {
+        'matric_num': matric_num,
+        'since': since
+    }
+
+    return query, values
+
+@metrics.timed_query
+def sync_student_logs(connection, matric_num, since):
+    try:
+        # The changes and the next cursor have to come from the same snapshot.
+        connection.rollback()
+
+        with connection.cursor() as cursor:
+            cursor.execute(SNAPSHOT_TRANSACTION)
+
+            cursor.execute(*sync_cursor_query())
+            next_cursor = cursor.fetchone()[0]
+
+            deleted = []
+            if since:
+                cursor.execute(*sync_horizon_query('logs'))
+                if since <= cursor.fetchone()[0]:
+                    connection.rollback()
+                    return None
+
+                cursor.execute(*deleted_logs_query(matric_num, since))
+                deleted = [row[0] for row in cursor.fetchall()]
+
+            cursor.execute(*changed_logs_query(matric_num, since))
+            logs = cursor.fetchall()
+
+        connection.rollback()
+
+        return logs, deleted, next_cursor
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def student_log_query(id, matric_num):
+    query = "SELECT id, entry_date, data, created_at, updated_at FROM logs "\
+            "WHERE id = %(id)s AND student = %(matric_num)s "\
+            f"AND {student_log_dates('%(matric_num)s')}"
+
+    values = {
+        'id': id,
+        'matric_num': matric_num
+    }
+
+    return query, values
+
+@metrics.timed_query
+def get_student_log(connection, id, matric_num):
+    query, values = student_log_query(id, matric_num)
+
     try:
         with connection.cursor() as cursor:
             cursor.execute(query, values)
 
+            return cursor.fetchone()
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def delete_log_query(id, matric_num):
+    query = "DELETE FROM logs "\
+            "WHERE id = %(id)s AND student = %(matric_num)s "\
+            f"AND {student_log_dates('%(matric_num)s')}"
+
+    values = {
+        'id': id,
+        'matric_num': matric_num
+    }
+
+    return query, values
+
+@metrics.timed_query
+def delete_log(connection, id, matric_num):
+    query, values = delete_log_query(id, matric_num)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            deleted = cursor.rowcount
+
         connection.commit()
+
+        return deleted
     except psycopg2.Error as error:
         connection.rollback()
         raise error
 
-def get_student_logs(connection, matric_num):
-    query = "SELECT * FROM logs WHERE student = %s"
+def course_week_logs_query(start, end, course=None):
+    query = "SELECT courses.name, course_week_logs.week, course_week_logs.log_count FROM course_week_logs "\
+            "JOIN courses ON course_week_logs.course = courses.code "\
+            "WHERE course_week_logs.week BETWEEN date_trunc('week', %(start)s::date)::date AND %(end)s::date "\
+            "AND (%(course)s::text IS NULL OR courses.name = %(course)s) "\
+            "ORDER BY courses.name, course_week_logs.week"
 
-    values = (matric_num,)
+    values = {
+        'start': start,
+        'end': end,
+        'course': course
+    }
+
+    return query, values
+
+@metrics.timed_query
+def get_course_week_logs(connection, start, end, course=None):
+    query, values = course_week_logs_query(start, end, course)
 
     try:
-        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+
+            return cursor.fetchall()
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def student_activity_query(start, end, course=None, missing=False, after=None, limit=None):
+    query = "SELECT students.matric_num, courses.name, coalesce(summaries.log_count, 0), days.days_logged, "\
+            "(%(end)s::date - %(start)s::date + 1) - days.days_logged, summaries.last_entry_date "\
+            "FROM students "\
+            "JOIN courses ON students.course = courses.code "\
+            "LEFT JOIN student_log_summaries summaries ON summaries.student = students.matric_num "\
+            "CROSS JOIN LATERAL ("\
+            "SELECT count(*) AS days_logged FROM student_log_days "\
+            "WHERE student_log_days.student = students.matric_num "\
+            "AND student_log_days.entry_date BETWEEN %(start)s::date AND %(end)s::date"\
+            ") days "\
+            "WHERE (%(after)s::varchar IS NULL OR students.matric_num > %(after)s) "\
+            "AND (%(course)s::text IS NULL OR courses.name = %(course)s) "\
+            "AND (NOT %(missing)s OR days.days_logged < %(end)s::date - %(start)s::date + 1) "\
+            "ORDER BY students.matric_num "\
+            "LIMIT %(limit)s"
+
+    values = {
+        'start': start,
+        'end': end,
+        'course': course,
+        'missing': missing,
+        'after': after,
+        'limit': limit
+    }
+
+    return query, values
+
+@metrics.timed_query
+def get_student_activity(connection, start, end, course=None, missing=False, after=None, limit=None):
+    query, values = student_activity_query(start, end, course, missing, after, limit)
+
+    try:
+        with connection.cursor() as cursor:
             cursor.execute(query, values)
 
             return cursor.fetchall()
@@ -280,13 +1165,201 @@ def get_student_logs(connection, matric_num):
         connection.rollback()
         raise error
 
-def get_student_log(connection, id):
-    query = "SELECT * FROM logs WHERE id = %s"
+def search_logs_query(terms, start, end, course=None, after=None, limit=None, candidates=None):
+    after_rank, after_id = after if after is not None else (None, None)
+
+    # One match past the cap is fetched so the response can say whether older matches
+    # were left out of the ranking.
+    query = "SELECT hits.id, students.matric_num, courses.name, hits.entry_date, "\
+            "ts_headline('english', hits.data, hits.query, %(headline)s), hits.truncated, hits.rank "\
+            "FROM ("\
+            "SELECT candidates.id, candidates.student, candidates.entry_date, candidates.data, query, "\
+            "candidates.truncated, ts_rank_cd(candidates.search, query) AS rank "\
+            "FROM ("\
+            "SELECT recent.*, "\
+            "row_number() OVER (ORDER BY recent.entry_date DESC, recent.id DESC) AS position, "\
+            "coalesce(count(*) OVER () > %(candidates)s::integer, false) AS truncated "\
+            "FROM ("\
+            "SELECT logs.id, logs.student, logs.entry_date, logs.data, logs.search FROM logs "\
+            f"WHERE {SEARCH_LOGS_FILTER} "\
+            "ORDER BY logs.entry_date DESC, logs.id DESC "\
+            "LIMIT %(candidates)s::integer + 1"\
+            ") recent"\
+            ") candidates "\
+            "CROSS JOIN websearch_to_tsquery('english', %(terms)s) query "\
+            "WHERE (%(candidates)s::integer IS NULL OR candidates.position <= %(candidates)s::integer) "\
+            "AND (%(after_rank)s::real IS NULL "\
+            "OR (ts_rank_cd(candidates.search, query), candidates.id) < (%(after_rank)s::real, %(after_id)s::integer)) "\
+            "ORDER BY rank DESC, candidates.id DESC "\
+            "LIMIT %(limit)s"\
+            ") hits "\
+            "JOIN students ON students.matric_num = hits.student "\
+            "JOIN courses ON students.course = courses.code "\
+            "ORDER BY hits.rank DESC, hits.id DESC"
+
+    values = {
+        'terms': terms,
+        'start': start,
+        'end': end,
+        'course': course,
+        'candidates': candidates,
+        'after_rank': after_rank,
+        'after_id': after_id,
+        'limit': limit,
+        'headline': HEADLINE_OPTIONS
+    }
+
+    return query, values
+
+@metrics.timed_query
+def search_logs(connection, terms, start, end, course=None, after=None, limit=None, candidates=None):
+    query, values = search_logs_query(terms, start, end, course, after, limit, candidates)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+
+            return cursor.fetchall()
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def search_logs_count_query(terms, start, end, course=None):
+    query = f"SELECT count(*) FROM logs WHERE {SEARCH_LOGS_FILTER}"
+
+    values = {
+        'terms': terms,
+        'start': start,
+        'end': end,
+        'course': course
+    }
+
+    return query, values
+
+@metrics.timed_query
+def count_search_logs(connection, terms, start, end, course=None):
+    query, values = search_logs_count_query(terms, start, end, course)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+
+            return cursor.fetchone()[0]
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def stream_search_logs(connection, terms, start, end, course=None):
+    query, values = search_logs_query(terms, start, end, course)
+
+    return stream_rows(connection, "search_logs_stream", query, values)
+
+def export_logs_query(format, course=None, start=None, end=None):
+    if format == 'ndjson':
+        columns = "json_build_object("\
+                  "'matric_num', students.matric_num, "\
+                  "'last_name', students.last_name, "\
+                  "'first_name', students.first_name, "\
+                  "'middle_name', students.middle_name, "\
+                  "'course', courses.name, "\
+                  "'id', logs.id, "\
+                  "'entry_date', to_char(logs.entry_date, %(date_format)s), "\
+                  "'data', logs.data"\
+                  ")::text"
+        options = "(FORMAT csv, DELIMITER E'\\x02', QUOTE E'\\x01')"
+    else:
+        columns = "students.matric_num, students.last_name, students.first_name, students.middle_name, "\
+                  "courses.name AS course, logs.id, logs.entry_date, logs.data"
+        options = "(FORMAT csv, HEADER)"
+
+    query = f"COPY (SELECT {columns} FROM logs "\
+            "JOIN students ON logs.student = students.matric_num "\
+            "JOIN courses ON students.course = courses.code "\
+            f"WHERE {EXPORT_LOGS_FILTER} "\
+            f"ORDER BY students.matric_num, logs.entry_date, logs.id) TO STDOUT WITH {options}"
+
+    values = {
+        'course': course,
+        'start': start,
+        'end': end,
+        'date_format': JSON_DATE_FORMAT
+    }
+
+    return query, values
+
+def stream_logs_export(pool, format, course=None, start=None, end=None):
+    return stream_copy(pool, *export_logs_query(format, course, start, end))
+
+def export_logs_count_query(course=None, start=None, end=None):
+    query = "SELECT count(*) FROM logs "\
+            "JOIN students ON logs.student = students.matric_num "\
+            "JOIN courses ON students.course = courses.code "\
+            f"WHERE {EXPORT_LOGS_FILTER}"
+
+    values = {
+        'course': course,
+        'start': start,
+        'end': end
+    }
+
+    return query, values
+
+@metrics.timed_query
+def count_logs_export(connection, course=None, start=None, end=None):
+    query, values = export_logs_count_query(course, start, end)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+
+            return cursor.fetchone()[0]
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def create_job_query(kind, params, created_by=None, max_attempts=3):
+    query = "INSERT INTO jobs (kind, params, created_by, max_attempts) "\
+            "VALUES (%(kind)s, %(params)s::jsonb, %(created_by)s, %(max_attempts)s) "\
+            f"RETURNING {JOB_COLUMNS}"
+
+    values = {
+        'kind': kind,
+        'params': json.dumps(params),
+        'created_by': created_by,
+        'max_attempts': max_attempts
+    }
+
+    return query, values
+
+@metrics.timed_query
+def create_job(connection, kind, params, created_by=None, max_attempts=3):
+    query, values = create_job_query(kind, params, created_by, max_attempts)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            job = cursor.fetchone()
+
+        connection.commit()
+
+        return job
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def job_query(id):
+    query = f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = %s"
 
     values = (id,)
 
+    return query, values
+
+@metrics.timed_query
+def get_job(connection, id):
+    query, values = job_query(id)
+
     try:
-        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+        with connection.cursor() as cursor:
             cursor.execute(query, values)
 
             return cursor.fetchone()
@@ -294,20 +1367,129 @@ def get_student_log(connection, id):
         connection.rollback()
         raise error
 
-def delete_log(connection, id):
-    log = get_student_log(connection, id)
-    if not log:
-        return 0
+def claim_job_query(lease):
+    query = "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = now(), "\
+            "locked_until = now() + %(lease)s * interval '1 second' "\
+            "WHERE id = ("\
+            "SELECT id FROM jobs "\
+            "WHERE (status = 'queued' AND run_at <= now()) "\
+            "OR (status = 'running' AND locked_until < now()) "\
+            "ORDER BY run_at, id "\
+            "LIMIT 1 "\
+            "FOR UPDATE SKIP LOCKED"\
+            ") "\
+            "RETURNING id, kind, params, attempts, max_attempts"
 
-    query = "DELETE FROM logs WHERE id = %s"
+    values = {'lease': lease}
 
-    values = (id,)
+    return query, values
+
+@metrics.timed_query
+def claim_job(connection, lease):
+    query, values = claim_job_query(lease)
 
     try:
-        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            job = cursor.fetchone()
+
+        connection.commit()
+
+        return job
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def job_progress_query(id, attempt, done, total, lease):
+    query = "UPDATE jobs SET progress_done = %(done)s, progress_total = %(total)s, "\
+            "locked_until = now() + %(lease)s * interval '1 second' "\
+            "WHERE id = %(id)s AND attempts = %(attempt)s AND status = 'running'"
+
+    values = {
+        'id': id,
+        'attempt': attempt,
+        'done': done,
+        'total': total,
+        'lease': lease
+    }
+
+    return query, values
+
+@metrics.timed_query
+def update_job_progress(connection, id, attempt, done, total, lease):
+    query, values = job_progress_query(id, attempt, done, total, lease)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            updated = cursor.rowcount
+
+        connection.commit()
+
+        return updated
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def finish_job_query(id, attempt, result):
+    query = "UPDATE jobs SET status = 'succeeded', result = %(result)s::jsonb, error = NULL, "\
+            "progress_done = coalesce(progress_total, progress_done), finished_at = now(), locked_until = NULL "\
+            "WHERE id = %(id)s AND attempts = %(attempt)s AND status = 'running'"
+
+    values = {
+        'id': id,
+        'attempt': attempt,
+        'result': json.dumps(result)
+    }
+
+    return query, values
+
+@metrics.timed_query
+def finish_job(connection, id, attempt, result):
+    query, values = finish_job_query(id, attempt, result)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, values)
+            updated = cursor.rowcount
+
+        connection.commit()
+
+        return updated
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def fail_job_query(id, attempt, message, retry_in=None):
+    query = "UPDATE jobs SET status = CASE WHEN %(retry_in)s::real IS NULL THEN 'failed' ELSE 'queued' END, "\
+            "error = %(message)s, "\
+            "run_at = CASE WHEN %(retry_in)s::real IS NULL THEN run_at "\
+            "ELSE now() + %(retry_in)s::real * interval '1 second' END, "\
+            "finished_at = CASE WHEN %(retry_in)s::real IS NULL THEN now() END, "\
+            "locked_until = NULL "\
+            "WHERE id = %(id)s AND attempts = %(attempt)s AND status = 'running'"
+
+    values = {
+        'id': id,
+        'attempt': attempt,
+        'message': message,
+        'retry_in': retry_in
+    }
+
+    return query, values
+
+@metrics.timed_query
+def fail_job(connection, id, attempt, message, retry_in=None):
+    query, values = fail_job_query(id, attempt, message, retry_in)
+
+    try:
+        with connection.cursor() as cursor:
             cursor.execute(query, values)
+            updated = cursor.rowcount
 
         connection.commit()
+
+        return updated
     except psycopg2.Error as error:
         connection.rollback()
-        raise error
\ No newline at end of file
+        raise error
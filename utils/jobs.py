@@ -0,0 +1,171 @@
+import os
+import time
+import random
+import logging
+
+from datetime import date
+
+from utils import database, serialization
+from utils.views import format_search_hit, EXPORT_MIMETYPES
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULT_DIR = os.path.join(ROOT_DIR, 'job_results')
+MAX_ATTEMPTS = 3
+LEASE_SECONDS = 60
+PROGRESS_SECONDS = 1
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 600
+LOGGER = logging.getLogger('siwes.jobs')
+
+HANDLERS = {}
+
+class JobLost(database.CopyCancelled):
+    pass
+
+def configure(config):
+    global RESULT_DIR, MAX_ATTEMPTS, LEASE_SECONDS, RETRY_BASE_SECONDS, RETRY_MAX_SECONDS
+
+    # Relative paths resolve against the project rather than each process's working
+    # directory, so the app and the worker agree on where results live. Across hosts
+    # this has to be shared storage.
+    RESULT_DIR = os.path.join(ROOT_DIR, config.get('JOBS', 'RESULT_DIR', fallback='job_results'))
+    MAX_ATTEMPTS = config.getint('JOBS', 'MAX_ATTEMPTS', fallback=3)
+    LEASE_SECONDS = config.getint('JOBS', 'LEASE_SECONDS', fallback=60)
+    RETRY_BASE_SECONDS = config.getfloat('JOBS', 'RETRY_BASE_SECONDS', fallback=10)
+    RETRY_MAX_SECONDS = config.getfloat('JOBS', 'RETRY_MAX_SECONDS', fallback=600)
+
+def handler(kind):
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+
+    return register
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+    # Jitter keeps jobs that failed together (e.g. during a database restart) from
+    # all retrying in the same instant.
+    return delay * random.uniform(0.5, 1)
+
+def result_path(result):
+    return os.path.join(RESULT_DIR, result['file'])
+
+class Progress:
+    def __init__(self, connection, id, attempt):
+        self.connection = connection
+        self.id = id
+        self.attempt = attempt
+        self.done = 0
+        self.total = None
+        self.reported = 0
+
+    def start(self, total):
+        self.total = total
+        self.report(force=True)
+
+    def advance(self, count=1):
+        self.done += count
+        self.report()
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.reported < PROGRESS_SECONDS:
+            return
+
+        self.reported = now
+
+        done = min(self.done, self.total) if self.total is not None else self.done
+        if not database.update_job_progress(self.connection, self.id, self.attempt, done, self.total, LEASE_SECONDS):
+            raise JobLost(f"Job {self.id} is no longer leased to this worker.")
+
+class ProgressWriter:
+    def __init__(self, file, progress):
+        self.file = file
+        self.progress = progress
+
+    def write(self, data):
+        self.file.write(data)
+        self.progress.advance(data.count(b'\n'))
+
+def write_result(id, extension, write):
+    os.makedirs(RESULT_DIR, exist_ok=True)
+
+    filename = f"{id}.{extension}"
+    path = os.path.join(RESULT_DIR, filename)
+
+    with open(f"{path}.tmp", 'wb') as file:
+        write(file)
+
+    os.replace(f"{path}.tmp", path)
+
+    return filename
+
+@handler('export_logs')
+def export_logs(connection, id, params, progress):
+    format = params['format']
+    course = params.get('course')
+    start = date.fromisoformat(params['start']) if params.get('start') else None
+    end = date.fromisoformat(params['end']) if params.get('end') else None
+
+    rows = database.count_logs_export(connection, course, start, end)
+    progress.start(rows)
+
+    def write(file):
+        query, values = database.export_logs_query(format, course, start, end)
+        database.copy_to(connection, query, values, ProgressWriter(file, progress))
+
+    return {'file': write_result(id, format, write), 'mimetype': EXPORT_MIMETYPES[format], 'rows': rows}
+
+@handler('search_logs')
+def search_logs(connection, id, params, progress):
+    terms = params['q']
+    course = params.get('course')
+    start = date.fromisoformat(params['start'])
+    end = date.fromisoformat(params['end'])
+
+    rows = database.count_search_logs(connection, terms, start, end, course)
+    progress.start(rows)
+
+    def write(file):
+        chunk = []
+
+        for hit in database.stream_search_logs(connection, terms, start, end, course):
+            chunk.append(serialization.dumps(format_search_hit(hit)) + '\n')
+
+            if len(chunk) >= database.STREAM_BATCH_SIZE:
+                file.write(''.join(chunk).encode())
+                progress.advance(len(chunk))
+                chunk = []
+
+        file.write(''.join(chunk).encode())
+
+    return {'file': write_result(id, 'ndjson', write), 'mimetype': EXPORT_MIMETYPES['ndjson'], 'rows': rows}
+
+def run_job(control, connection, job):
+    id, kind, params, attempts, max_attempts = job
+
+    if attempts > max_attempts:
+        database.fail_job(control, id, attempts, "Job was abandoned by its worker too many times.")
+        return
+
+    function = HANDLERS.get(kind)
+    if function is None:
+        database.fail_job(control, id, attempts, f"Unknown job kind {kind!r}.")
+        return
+
+    LOGGER.info("Running job %s (%s), attempt %s of %s", id, kind, attempts, max_attempts)
+
+    try:
+        result = function(connection, id, params, Progress(control, id, attempts))
+    except JobLost:
+        LOGGER.warning("Lost the lease on job %s", id)
+        return
+    except Exception as error:
+        LOGGER.exception("Job %s failed", id)
+
+        retry_in = retry_delay(attempts) if attempts < max_attempts else None
+        database.fail_job(control, id, attempts, str(error) or type(error).__name__, retry_in)
+        return
+
+    database.finish_job(control, id, attempts, result)
@@ -0,0 +1,209 @@
+import time
+import inspect
+import logging
+import threading
+import functools
+import contextlib
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SLOW_QUERY_SECONDS = None
+TOKEN = None
+LOGGER = logging.getLogger('siwes.slow_queries')
+
+REGISTRY = []
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+
+        for labels, value in values.items():
+            yield self.name, dict(zip(self.labels, labels)), value
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def observe(self, value, *labels):
+        with self.lock:
+            counts, total = self.values.get(labels, (None, 0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+
+            self.values[labels] = (counts, total + value)
+
+    def samples(self):
+        with self.lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self.values.items()}
+
+        for labels, (counts, total) in values.items():
+            names = dict(zip(self.labels, labels))
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield self.name + '_bucket', dict(names, le=str(bound)), cumulative
+
+            yield self.name + '_sum', names, total
+            yield self.name + '_count', names, cumulative
+
+class Stats:
+    kind = 'gauge'
+
+    def __init__(self, prefix, description, function):
+        self.prefix = prefix
+        self.description = description
+        self.function = function
+
+    def families(self):
+        for key, value in self.function().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield f"{self.prefix}_{key}", f"{self.description} ({key})", value
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+def register_stats(prefix, description, function):
+    # Building the app again (e.g. in tests) replaces the stats of the previous one.
+    REGISTRY[:] = [metric for metric in REGISTRY if not (isinstance(metric, Stats) and metric.prefix == prefix)]
+
+    return register(Stats(prefix, description, function))
+
+QUERY_SECONDS = register(Histogram('siwes_db_query_seconds', "Database query latency.", ('query',)))
+REQUEST_SECONDS = register(Histogram('siwes_http_request_seconds', "Request latency.", ('method', 'route')))
+REQUESTS = register(Counter(
+    'siwes_http_requests_total', "Requests by response status.", ('method', 'route', 'status')
+))
+PASSWORD_SECONDS = register(Histogram('siwes_password_seconds', "Password hashing latency.", ('operation',)))
+AUTH_SECONDS = register(Histogram('siwes_auth_seconds', "Request authentication latency.", ('role',)))
+TOKEN_SECONDS = register(Histogram('siwes_token_decode_seconds', "JWT decoding latency."))
+SERIALIZE_SECONDS = register(Histogram('siwes_json_serialize_seconds', "JSON serialization latency."))
+ADMISSION_SHED = register(Counter(
+    'siwes_admission_shed_total', "Requests rejected by admission control.", ('budget', 'reason')
+))
+
+def configure(config):
+    global SLOW_QUERY_SECONDS, TOKEN
+
+    slow_query_ms = config.getfloat('METRICS', 'SLOW_QUERY_MS', fallback=None)
+    SLOW_QUERY_SECONDS = slow_query_ms / 1000 if slow_query_ms is not None else None
+    TOKEN = config.get('METRICS', 'TOKEN', fallback=None)
+
+@contextlib.contextmanager
+def timer(histogram, *labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, *labels)
+
+def observe_query(label, seconds):
+    QUERY_SECONDS.observe(seconds, label)
+
+    if SLOW_QUERY_SECONDS is not None and seconds >= SLOW_QUERY_SECONDS:
+        LOGGER.warning("Slow query %s took %.1f ms", label, seconds * 1000)
+
+def instrument(function, observe):
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                observe(time.perf_counter() - start)
+
+        return wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            observe(time.perf_counter() - start)
+
+    return wrapper
+
+def timed(histogram, *labels):
+    return lambda function: instrument(function, lambda seconds: histogram.observe(seconds, *labels))
+
+def timed_query(function):
+    label = function.__name__
+
+    return instrument(function, lambda seconds: observe_query(label, seconds))
+
+def observe_request(method, route, status, seconds):
+    route = route or 'unmatched'
+
+    REQUEST_SECONDS.observe(seconds, method, route)
+    REQUESTS.inc(method, route, str(status))
+
+def authorized(headers):
+    if TOKEN is None:
+        return True
+
+    return headers.get('Authorization') == f"Bearer {TOKEN}"
+
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+
+    return '{' + ','.join(escaped) + '}'
+
+def render():
+    lines = []
+
+    for metric in REGISTRY:
+        if isinstance(metric, Stats):
+            for name, description, value in metric.families():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+
+            continue
+
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{format_labels(labels)} {value}")
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,125 @@
+import os
+import sys
+import argparse
+
+import psycopg2
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+MIGRATION_LOCK_ID = 7274623
+
+class SchemaVersionError(Exception):
+    pass
+
+def load_migrations():
+    migrations = []
+
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith('.sql'):
+            continue
+
+        version, _, name = filename[:-len('.sql')].partition('_')
+
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as file:
+            migrations.append((int(version), name, file.read()))
+
+    return migrations
+
+def get_schema_version(connection):
+    query = "SELECT coalesce(max(version), 0) FROM schema_migrations"
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('schema_migrations')")
+            if cursor.fetchone()[0] is None:
+                return 0
+
+            cursor.execute(query)
+
+            return cursor.fetchone()[0]
+    finally:
+        connection.rollback()
+
+def check_schema_version(connection):
+    current = get_schema_version(connection)
+    latest = load_migrations()[-1][0]
+
+    if current < latest:
+        raise SchemaVersionError(
+            f"Database schema is at version {current}, expected {latest}. "
+            "Run `python -m utils.migrations upgrade` to apply pending migrations."
+        )
+
+def apply_migrations(connection, target=None):
+    applied = []
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                version integer NOT NULL PRIMARY KEY,
+                name text NOT NULL,
+                applied_at timestamptz NOT NULL DEFAULT now()
+                );
+            """)
+
+        connection.commit()
+
+        current = get_schema_version(connection)
+
+        for version, name, sql in load_migrations():
+            if version <= current or (target is not None and version > target):
+                continue
+
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+
+            connection.commit()
+            applied.append((version, name))
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+
+        connection.commit()
+
+    return applied
+
+def main(argv=None):
+    from utils import config, database
+
+    parser = argparse.ArgumentParser(description="Manage the database schema.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    upgrade = subparsers.add_parser('upgrade', help="apply pending migrations")
+    upgrade.add_argument('--target', type=int, help="stop after this version")
+
+    subparsers.add_parser('status', help="show the current and latest schema versions")
+
+    args = parser.parse_args(argv)
+
+    connection = database.connect_to_db(config.load_config())
+
+    try:
+        if args.command == 'status':
+            print(f"current: {get_schema_version(connection)}")
+            print(f"latest: {load_migrations()[-1][0]}")
+        elif args.command == 'upgrade':
+            for version, name in apply_migrations(connection, args.target):
+                print(f"applied {version:04d}_{name}")
+        else:
+            parser.print_help()
+            return 1
+    finally:
+        connection.close()
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
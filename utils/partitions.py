@@ -0,0 +1,214 @@
+import os
+import sys
+import gzip
+import argparse
+
+from datetime import date, datetime
+
+import psycopg2
+import psycopg2.sql as sql
+
+from utils import database
+
+PARTITION_LOCK_ID = 7274624
+PARTITION_NAME_FORMAT = 'logs_%Y_%m'
+MONTHS_AHEAD = 3
+
+def add_months(month, months):
+    year, index = divmod(month.year * 12 + month.month - 1 + months, 12)
+
+    return date(year, index + 1, 1)
+
+def months_ahead(config):
+    return config.getint('PARTITIONS', 'MONTHS_AHEAD', fallback=MONTHS_AHEAD)
+
+def partition_month(name):
+    try:
+        return datetime.strptime(name, PARTITION_NAME_FORMAT).date()
+    except ValueError:
+        return None
+
+def list_partitions(connection):
+    query = "SELECT child.relname, child.reltuples::bigint FROM pg_inherits "\
+            "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "\
+            "WHERE pg_inherits.inhparent = 'logs'::regclass "\
+            "ORDER BY child.relname"
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            rows = cursor.fetchall()
+
+        connection.rollback()
+
+        return [(name, partition_month(name), max(estimate, 0)) for name, estimate in rows]
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def create_partitions(connection, months=MONTHS_AHEAD, today=None):
+    start = (today or date.today()).replace(day=1)
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_ID,))
+            cursor.execute(
+                "SELECT create_log_partition(month::date) FROM generate_series(%s::date, %s::date, interval '1 month') month",
+                (start, add_months(start, months))
+            )
+            created = [row[0] for row in cursor.fetchall()]
+
+        connection.commit()
+
+        return created
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def detach_partition(cursor, name):
+    table = sql.Identifier(name)
+
+    # Logs disappear from every student that had one in this month, so cached
+    # student and log responses have to be invalidated and synced clients told
+    # to drop them.
+    cursor.execute(
+        sql.SQL("UPDATE students SET version = version + 1 WHERE matric_num IN (SELECT student FROM {})").format(table)
+    )
+    cursor.execute(
+        sql.SQL(
+            "INSERT INTO log_tombstones (id, student) SELECT id, student FROM {} "
+            "ON CONFLICT (id) DO UPDATE SET deleted_at = now(), change_xid = pg_current_xact_id()"
+        ).format(table)
+    )
+    cursor.execute(sql.SQL("ALTER TABLE logs DETACH PARTITION {}").format(table))
+
+def write_partition(cursor, name, path):
+    query = sql.SQL(
+        "COPY (SELECT id, entry_date, data, student FROM {} ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)"
+    ).format(sql.Identifier(name))
+
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as file:
+            cursor.copy_expert(query, file)
+
+        raw.flush()
+        os.fsync(raw.fileno())
+
+def archive_partition(connection, name, directory=None, keep=False):
+    path = os.path.join(directory, f"{name}.csv.gz") if directory is not None else None
+
+    # Writing the file, detaching and dropping happen in one transaction, so a
+    # failed write leaves the partition attached for the next run to retry.
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_ID,))
+
+            # Late writes to the month wait until it is detached instead of
+            # missing the file.
+            cursor.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(sql.Identifier(name)))
+
+            if path is not None:
+                write_partition(cursor, name, f"{path}.tmp")
+
+            detach_partition(cursor, name)
+
+            if not keep:
+                cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+
+        if path is not None:
+            os.replace(f"{path}.tmp", path)
+
+        connection.commit()
+
+        return path
+    except (psycopg2.Error, OSError) as error:
+        connection.rollback()
+        raise error
+
+def archive_partitions(connection, before, directory=None, keep=False):
+    archived = []
+
+    for name, month, _ in list_partitions(connection):
+        if month is None or add_months(month, 1) > before:
+            continue
+
+        archived.append((name, archive_partition(connection, name, directory, keep)))
+
+    return archived
+
+def prune_tombstones(connection, before):
+    # Clients whose cursor is older than the newest pruned tombstone may have missed a
+    # deletion, so the horizon moves past it and their next sync is refused.
+    query = "WITH pruned AS ("\
+            "DELETE FROM log_tombstones WHERE deleted_at < %s RETURNING change_xid"\
+            "), horizon AS ("\
+            "UPDATE sync_horizons SET horizon = greatest(horizon, (SELECT max(change_xid) FROM pruned)) "\
+            "WHERE name = 'logs' AND EXISTS (SELECT FROM pruned)"\
+            ") SELECT count(*) FROM pruned"
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, (before,))
+            pruned = cursor.fetchone()[0]
+
+        connection.commit()
+
+        return pruned
+    except psycopg2.Error as error:
+        connection.rollback()
+        raise error
+
+def main(argv=None):
+    from utils import config
+
+    parser = argparse.ArgumentParser(description="Manage the monthly partitions of the logs table.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    create = subparsers.add_parser('create', help="create partitions for the current and upcoming months")
+    create.add_argument('--months', type=int, help="number of months ahead to create")
+
+    subparsers.add_parser('list', help="show the attached partitions")
+
+    archive = subparsers.add_parser('archive', help="detach the partitions of closed sessions")
+    archive.add_argument('--before', type=date.fromisoformat, required=True, help="first day still in a live session")
+    archive.add_argument('--dir', help="write each partition to a gzipped CSV file in this directory")
+    archive.add_argument('--keep', action='store_true', help="keep the detached tables instead of dropping them")
+
+    prune = subparsers.add_parser('prune-tombstones', help="forget deleted logs so they stop being synced")
+    prune.add_argument('--before', type=date.fromisoformat, required=True, help="keep deletions from this day on")
+
+    args = parser.parse_args(argv)
+
+    settings = config.load_config()
+    connection = database.connect_to_db(settings)
+
+    try:
+        if args.command == 'create':
+            months = args.months if args.months is not None else months_ahead(settings)
+
+            for name in create_partitions(connection, months):
+                print(f"ready {name}")
+        elif args.command == 'list':
+            for name, _, rows in list_partitions(connection):
+                print(f"{name} ~{rows} rows")
+        elif args.command == 'archive':
+            if args.dir is None and not args.keep:
+                parser.error("archive needs --dir, --keep or both")
+
+            if args.dir is not None:
+                os.makedirs(args.dir, exist_ok=True)
+
+            for name, path in archive_partitions(connection, args.before, args.dir, args.keep):
+                print(f"archived {name}" + (f" to {path}" if path else ""))
+        elif args.command == 'prune-tombstones':
+            print(f"pruned {prune_tombstones(connection, args.before)} tombstones")
+        else:
+            parser.print_help()
+            return 1
+    finally:
+        connection.close()
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
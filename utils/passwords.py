@@ -0,0 +1,149 @@
+import os
+import threading
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from utils import metrics
+
+HASH_METHOD = 'scrypt:32768:8:1'
+WORKERS = os.cpu_count() or 1
+MAX_PENDING = WORKERS * 8
+QUEUE_TIMEOUT = 5
+BULK_CHUNK_SIZE = 16
+
+EXECUTOR = None
+EXECUTOR_LOCK = threading.Lock()
+SLOTS = threading.BoundedSemaphore(MAX_PENDING)
+
+STATS_LOCK = threading.Lock()
+STATS = {
+    'pending': 0,
+    'completed': 0,
+    'rejected': 0
+}
+
+class HashingBusy(Exception):
+    pass
+
+def configure(config):
+    global HASH_METHOD, WORKERS, MAX_PENDING, QUEUE_TIMEOUT, SLOTS
+
+    HASH_METHOD = "scrypt:{}:{}:{}".format(
+        config.getint('HASHING', 'SCRYPT_N', fallback=32768),
+        config.getint('HASHING', 'SCRYPT_R', fallback=8),
+        config.getint('HASHING', 'SCRYPT_P', fallback=1)
+    )
+    WORKERS = config.getint('HASHING', 'WORKERS', fallback=os.cpu_count() or 1)
+    MAX_PENDING = config.getint('HASHING', 'MAX_PENDING', fallback=WORKERS * 8)
+    QUEUE_TIMEOUT = config.getfloat('HASHING', 'QUEUE_TIMEOUT', fallback=5)
+    SLOTS = threading.BoundedSemaphore(MAX_PENDING)
+
+def get_executor():
+    global EXECUTOR
+
+    with EXECUTOR_LOCK:
+        if EXECUTOR is None and multiprocessing.current_process().daemon:
+            # Daemonic workers (hypercorn's) may not start children. hashlib's scrypt
+            # releases the GIL, so threads still hash in parallel.
+            EXECUTOR = ThreadPoolExecutor(max_workers=WORKERS)
+        elif EXECUTOR is None:
+            # The pool starts lazily from a process that is already serving on
+            # several threads, so workers come from the single-threaded fork server
+            # rather than a fork that could copy locks held by those threads.
+            EXECUTOR = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('forkserver'))
+
+        return EXECUTOR
+
+def discard_executor(executor):
+    global EXECUTOR
+
+    with EXECUTOR_LOCK:
+        if EXECUTOR is executor:
+            EXECUTOR = None
+
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def with_executor(work):
+    executor = get_executor()
+
+    try:
+        return work(executor)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory) and took the pool with it. Hashing
+        # is safe to repeat, so the work runs once more on a fresh pool.
+        discard_executor(executor)
+
+        return work(get_executor())
+
+def hash_password(password, method):
+    return generate_password_hash(password, method)
+
+def hash_chunk(passwords, method):
+    return [generate_password_hash(password, method) for password in passwords]
+
+def check_password(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+def run(function, *args):
+    if not SLOTS.acquire(timeout=QUEUE_TIMEOUT):
+        with STATS_LOCK:
+            STATS['rejected'] += 1
+
+        raise HashingBusy("Too many password operations in progress.")
+
+    with STATS_LOCK:
+        STATS['pending'] += 1
+
+    try:
+        return with_executor(lambda executor: executor.submit(function, *args).result())
+    finally:
+        SLOTS.release()
+
+        with STATS_LOCK:
+            STATS['pending'] -= 1
+            STATS['completed'] += 1
+
+@metrics.timed(metrics.PASSWORD_SECONDS, 'generate')
+def generate(password):
+    return run(hash_password, password, HASH_METHOD)
+
+@metrics.timed(metrics.PASSWORD_SECONDS, 'verify')
+def verify(password_hash, password):
+    return run(check_password, password_hash, password)
+
+def hash_chunks(executor, chunks):
+    results = [None] * len(chunks)
+    running = {}
+    next_chunk = 0
+
+    # Only keep one chunk per worker queued so interactive logins are never
+    # stuck behind a whole import.
+    while next_chunk < len(chunks) or running:
+        while next_chunk < len(chunks) and len(running) < WORKERS:
+            future = executor.submit(hash_chunk, chunks[next_chunk], HASH_METHOD)
+            running[future] = next_chunk
+            next_chunk += 1
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[running.pop(future)] = future.result()
+
+    return [password_hash for chunk in results for password_hash in chunk]
+
+@metrics.timed(metrics.PASSWORD_SECONDS, 'hash_passwords')
+def hash_passwords(passwords):
+    passwords = list(passwords)
+    chunks = [passwords[start:start + BULK_CHUNK_SIZE] for start in range(0, len(passwords), BULK_CHUNK_SIZE)]
+
+    return with_executor(lambda executor: hash_chunks(executor, chunks))
+
+def stats():
+    with STATS_LOCK:
+        return {
+            'workers': WORKERS,
+            'max_pending': MAX_PENDING,
+            **STATS
+        }
@@ -0,0 +1,49 @@
+import json
+import uuid
+import decimal
+import functools
+
+from datetime import date
+
+import orjson
+
+from werkzeug.http import http_date
+
+SERIALIZER = 'orjson'
+
+def configure(config):
+    global SERIALIZER
+
+    SERIALIZER = config.get('JSON', 'SERIALIZER', fallback='orjson')
+    if SERIALIZER not in SERIALIZERS:
+        raise ValueError(f"Unknown JSON serializer {SERIALIZER!r}, expected one of {', '.join(SERIALIZERS)}.")
+
+@functools.lru_cache(maxsize=4096)
+def format_date(value):
+    return http_date(value)
+
+def default(value):
+    if isinstance(value, date):
+        return format_date(value)
+
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def orjson_dumps(value):
+    return orjson.dumps(value, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode()
+
+def json_dumps(value):
+    return json.dumps(value, default=default, ensure_ascii=False, separators=(',', ':'))
+
+SERIALIZERS = {
+    'orjson': (orjson_dumps, orjson.loads),
+    'json': (json_dumps, json.loads)
+}
+
+def dumps(value):
+    return SERIALIZERS[SERIALIZER][0](value)
+
+def loads(data):
+    return SERIALIZERS[SERIALIZER][1](data)
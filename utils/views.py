@@ -0,0 +1,331 @@
+import io
+import csv
+import hashlib
+
+from datetime import date, timedelta
+
+from utils.authentication import HTTPError
+
+MAX_PAGE_SIZE = 1000
+MAX_IMPORT_ROWS = 10000
+IMPORT_FIELDS = ('matric_num', 'password', 'first_name', 'last_name', 'middle_name', 'course')
+MAX_BATCH_LOGS = 1000
+MAX_ANALYTICS_DAYS = 366
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_CANDIDATES = 10000
+STREAM_CHUNK_SIZE = 500
+MAX_SYNC_CURSOR = 2 ** 63 - 1
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+def format_student(student):
+    matric_num, first_name, last_name, middle_name, course = student
+
+    return {
+        'matric_num': matric_num,
+        'last_name': last_name,
+        'first_name': first_name,
+        'middle_name': middle_name,
+        'course': course
+    }
+
+def format_log(log):
+    id, entry_date, data, created_at, updated_at = log
+
+    return {
+        'id': id,
+        'entry_date': entry_date,
+        'data': data,
+        'created_at': created_at,
+        'updated_at': updated_at
+    }
+
+def format_course_week(row):
+    course, week, logs = row
+
+    return {
+        'course': course,
+        'week': week,
+        'logs': logs
+    }
+
+def format_student_activity(row):
+    matric_num, course, logs, days_logged, missing_days, last_entry_date = row
+
+    return {
+        'matric_num': matric_num,
+        'course': course,
+        'logs': logs,
+        'days_logged': days_logged,
+        'missing_days': missing_days,
+        'last_entry_date': last_entry_date
+    }
+
+def format_search_hit(row):
+    id, matric_num, course, entry_date, snippet, truncated, rank = row
+
+    return {
+        'id': id,
+        'matric_num': matric_num,
+        'course': course,
+        'entry_date': entry_date,
+        'snippet': snippet,
+        'rank': rank
+    }
+
+def format_job(row):
+    (
+        id, kind, status, params, attempts, max_attempts, done, total, result, error,
+        created_at, run_at, started_at, finished_at
+    ) = row
+
+    return {
+        'id': id,
+        'kind': kind,
+        'status': status,
+        'params': params,
+        'attempts': attempts,
+        'max_attempts': max_attempts,
+        'progress': {'done': done, 'total': total},
+        'rows': result['rows'] if result else None,
+        'result': f'/jobs/{id}/result' if status == 'succeeded' else None,
+        'error': error,
+        'created_at': created_at,
+        'run_at': run_at,
+        'started_at': started_at,
+        'finished_at': finished_at
+    }
+
+def search_cursor(row):
+    return f"{row[-1]!r}:{row[0]}"
+
+def make_etag(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+def tag_response(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+
+    return response
+
+def get_limit(args):
+    try:
+        limit = args.get('limit')
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        raise HTTPError(400, "Incorrect request format.")
+
+    if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+        raise HTTPError(400, "Incorrect request format.")
+
+    return limit
+
+def get_page_args(args, key_type=str):
+    try:
+        after = args.get('after')
+        after = key_type(after) if after is not None else None
+    except ValueError:
+        raise HTTPError(400, "Incorrect request format.")
+
+    return after, get_limit(args)
+
+def get_sync_cursor(args):
+    try:
+        since = int(args['since'])
+    except ValueError:
+        raise HTTPError(400, "Incorrect request format.")
+
+    # Cursors are handed out as bigints, so anything outside that range is not one.
+    if not 0 <= since <= MAX_SYNC_CURSOR:
+        raise HTTPError(400, "Incorrect request format.")
+
+    return since
+
+def get_date_range(args):
+    try:
+        end = args.get('end')
+        end = date.fromisoformat(end) if end is not None else date.today()
+
+        start = args.get('start')
+        start = date.fromisoformat(start) if start is not None else end - timedelta(days=6)
+    except ValueError:
+        raise HTTPError(400, "Incorrect request format.")
+
+    if not 0 <= (end - start).days < MAX_ANALYTICS_DAYS:
+        raise HTTPError(400, "Incorrect request format.")
+
+    return start, end
+
+def get_search_args(args):
+    terms = args.get('q', '').strip()
+    if not terms:
+        raise HTTPError(400, "Incomplete request data.")
+
+    start, end = get_date_range(args)
+
+    try:
+        after = args.get('after')
+        if after is not None:
+            rank, _, id = after.partition(':')
+            after = (float(rank), int(id))
+    except ValueError:
+        raise HTTPError(400, "Incorrect request format.")
+
+    limit = get_limit(args) or SEARCH_PAGE_SIZE
+
+    return terms, args.get('course'), start, end, after, limit
+
+def get_export_args(args):
+    format = args.get('format', 'csv')
+    if format not in EXPORT_MIMETYPES:
+        raise HTTPError(400, "Incorrect request format.")
+
+    try:
+        start = args.get('start')
+        start = date.fromisoformat(start) if start is not None else None
+
+        end = args.get('end')
+        end = date.fromisoformat(end) if end is not None else None
+    except ValueError:
+        raise HTTPError(400, "Incorrect request format.")
+
+    if start is not None and end is not None and start > end:
+        raise HTTPError(400, "Incorrect request format.")
+
+    return format, args.get('course'), start, end
+
+def get_job_args(body):
+    if not isinstance(body, dict) or body.get('kind') not in JOB_KINDS:
+        raise HTTPError(400, "Incorrect request format.")
+
+    params = body.get('params') or {}
+    if not isinstance(params, dict):
+        raise HTTPError(400, "Incorrect request format.")
+
+    # Job parameters are validated exactly like the query string of the matching endpoint.
+    args = {key: str(value) for key, value in params.items() if value is not None}
+
+    return body['kind'], JOB_KINDS[body['kind']](args)
+
+def get_search_job_params(args):
+    terms, course, start, end, _, _ = get_search_args(args)
+
+    return {'q': terms, 'course': course, 'start': start.isoformat(), 'end': end.isoformat()}
+
+def get_export_job_params(args):
+    format, course, start, end = get_export_args(args)
+
+    return {
+        'format': format,
+        'course': course,
+        'start': start.isoformat() if start is not None else None,
+        'end': end.isoformat() if end is not None else None
+    }
+
+JOB_KINDS = {
+    'search_logs': get_search_job_params,
+    'export_logs': get_export_job_params
+}
+
+def export_headers(format):
+    return {'Content-Disposition': f'attachment; filename="logs.{format}"'}
+
+def get_stream_mode(args):
+    mode = args.get('stream')
+    if mode not in ('json', 'ndjson'):
+        raise HTTPError(400, "Incorrect request format.")
+
+    return mode
+
+def page_rows(rows, limit, cursor=lambda row: row[0]):
+    if limit is None or len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, cursor(rows[-1])
+
+def validate_logs(logs):
+    if not isinstance(logs, list) or not logs:
+        raise HTTPError(400, "Incomplete log data.")
+
+    if len(logs) > MAX_BATCH_LOGS:
+        raise HTTPError(413, f"At most {MAX_BATCH_LOGS} logs can be added at once.")
+
+    for index, log in enumerate(logs):
+        if not isinstance(log, dict) or not log.get('entry_date') or not log.get('data'):
+            raise HTTPError(400, f"Incomplete log data at index {index}.")
+
+        try:
+            date.fromisoformat(log['entry_date'])
+        except (TypeError, ValueError):
+            raise HTTPError(400, f"Invalid entry date at index {index}.")
+
+        if not isinstance(log['data'], str):
+            raise HTTPError(400, f"Invalid log data at index {index}.")
+
+def read_csv_rows(body):
+    return list(csv.DictReader(io.StringIO(body)))
+
+def prepare_import(rows, course_codes):
+    if not isinstance(rows, list) or not rows:
+        raise HTTPError(400, "Incomplete student data.")
+
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise HTTPError(413, f"At most {MAX_IMPORT_ROWS} students can be imported at once.")
+
+    results = []
+    students = []
+    seen = set()
+
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            row = {}
+
+        matric_num = row.get('matric_num')
+        result = {'row': index, 'matric_num': matric_num}
+        results.append(result)
+
+        if (
+            not matric_num or not row.get('password') or not row.get('first_name') or
+            not row.get('last_name') or not row.get('course')
+        ):
+            result.update(status='invalid', message="Incomplete student data.")
+        elif any(not isinstance(row[field], str) for field in IMPORT_FIELDS if row.get(field) is not None):
+            result.update(status='invalid', message="Invalid student data.")
+        elif len(matric_num) > 10:
+            result.update(status='invalid', message="Invalid matric number.")
+        elif row['course'] not in course_codes:
+            result.update(status='invalid', message="Unknown course.")
+        elif matric_num in seen:
+            result.update(status='conflict', message="Duplicate student in import.")
+        else:
+            seen.add(matric_num)
+            students.append({
+                'matric_num': matric_num,
+                'password': row['password'],
+                'first_name': row['first_name'],
+                'last_name': row['last_name'],
+                'middle_name': row.get('middle_name') or None,
+                'course': course_codes[row['course']]
+            })
+
+    return results, students
+
+def complete_import(results, created):
+    for result in results:
+        if 'status' in result:
+            continue
+
+        if result['matric_num'] in created:
+            result['status'] = 'created'
+        else:
+            result.update(status='conflict', message="This student already has an account on this platform.")
+
+    return {
+        'created': sum(result['status'] == 'created' for result in results),
+        'conflicts': sum(result['status'] == 'conflict' for result in results),
+        'invalid': sum(result['status'] == 'invalid' for result in results),
+        'results': results
+    }
@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import select
+import signal
+import logging
+import multiprocessing
+
+import psycopg2
+
+from utils import config, database, jobs, migrations, partitions, serialization
+
+CONFIG = config.load_config()
+WORKERS = CONFIG.getint('JOBS', 'WORKERS', fallback=os.cpu_count() or 1)
+POLL_SECONDS = CONFIG.getfloat('JOBS', 'POLL_SECONDS', fallback=5)
+RECONNECT_SECONDS = 5
+PARTITION_CHECK_SECONDS = 3600
+
+LOGGER = logging.getLogger('siwes.worker')
+
+def connect():
+    control = database.connect_to_db(CONFIG)
+
+    with control.cursor() as cursor:
+        cursor.execute("LISTEN jobs")
+
+    control.commit()
+
+    return control, database.connect_to_db(CONFIG)
+
+def wait_for_jobs(control):
+    # New jobs wake the worker through NOTIFY; the poll interval only matters for
+    # retries coming due and leases of crashed workers expiring.
+    if select.select([control], [], [], POLL_SECONDS) != ([], [], []):
+        control.poll()
+        control.notifies.clear()
+
+def create_partitions():
+    # Long-running app processes only create partitions on start-up, so the worker
+    # keeps the coming months provisioned and logs never pile up in logs_default.
+    try:
+        connection = database.connect_to_db(CONFIG)
+        try:
+            partitions.create_partitions(connection, partitions.months_ahead(CONFIG))
+        finally:
+            connection.close()
+    except psycopg2.Error:
+        LOGGER.exception("Could not create the upcoming log partitions")
+
+def run(stop):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    jobs.configure(CONFIG)
+    serialization.configure(CONFIG)
+
+    control = connection = None
+
+    while not stop.is_set():
+        try:
+            if control is None:
+                control, connection = connect()
+
+            job = database.claim_job(control, jobs.LEASE_SECONDS)
+            if job is None:
+                wait_for_jobs(control)
+                continue
+
+            jobs.run_job(control, connection, job)
+
+            if connection.closed:
+                connection = database.connect_to_db(CONFIG)
+            else:
+                connection.rollback()
+        except psycopg2.OperationalError:
+            LOGGER.exception("Lost the database connection, reconnecting in %s seconds", RECONNECT_SECONDS)
+
+            for stale in (control, connection):
+                if stale is not None and not stale.closed:
+                    stale.close()
+
+            control = connection = None
+            stop.wait(RECONNECT_SECONDS)
+
+    for open_connection in (control, connection):
+        if open_connection is not None and not open_connection.closed:
+            open_connection.close()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    connection = database.connect_to_db(CONFIG)
+    try:
+        migrations.check_schema_version(connection)
+    finally:
+        connection.close()
+
+    # Each worker opens its own connections after the fork.
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+
+    # Setting a multiprocessing.Event from a signal handler can deadlock against
+    # the main loop waiting on it, so the handler only records the signal.
+    signals = []
+
+    signal.signal(signal.SIGINT, lambda signum, frame: signals.append(signum))
+    signal.signal(signal.SIGTERM, lambda signum, frame: signals.append(signum))
+
+    processes = {}
+    partitions_checked = None
+
+    while not signals:
+        if partitions_checked is None or time.monotonic() - partitions_checked >= PARTITION_CHECK_SECONDS:
+            create_partitions()
+            partitions_checked = time.monotonic()
+
+        for index in range(WORKERS):
+            process = processes.get(index)
+            if process is not None and process.is_alive():
+                continue
+
+            if process is not None:
+                LOGGER.warning("Worker %s exited with %s, restarting", index, process.exitcode)
+
+            process = context.Process(target=run, args=(stop,), name=f"worker-{index}")
+            process.start()
+            processes[index] = process
+
+        time.sleep(1)
+
+    LOGGER.info("Stopping after the running jobs finish")
+    stop.set()
+
+    for process in processes.values():
+        process.join()
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,12 @@
+from app import create_app
+
+# Production entry point for the Flask app, e.g. one worker per core:
+#
+#     SIWES_CONFIG=/etc/siwes/config.ini gunicorn --workers 4 --bind 0.0.0.0:4000 wsgi:app
+#
+# Each worker opens its own database connections on its first request, so building
+# the app in the master first (gunicorn --preload) is safe. Hypercorn also works
+# (hypercorn --workers 4 wsgi:app, or 'asgi:create_app()' for the ASGI app), but its
+# workers are daemonic and cannot start the password hashing processes, so they hash
+# on a thread pool instead.
+app = create_app()